@@ -1,9 +1,12 @@
 # db.py
+import os
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlmodel import SQLModel
 
-DATABASE_URL = ""
+DATABASE_URL = os.getenv("DATABASE_URL", "")
 
 engine = create_async_engine(DATABASE_URL, echo=True)
 AsyncSessionLocal = sessionmaker(
@@ -17,12 +20,82 @@ Base = declarative_base()
 from models import user_models
 from models import lookup
 from models import medicine_models
+from models import temperature_humidity
+
+# create_all ne dodaje indekse ni kolone u tabele koje vec postoje,
+# pa se izmjene seme za postojece baze ovdje ponavljaju (idempotentno)
+SCHEMA_UPDATES = [
+    "CREATE INDEX IF NOT EXISTS ix_medicine_name_lower ON medicine (lower(name) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_medicine_name_id ON medicine (name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_medicine_quantity_id ON medicine (quantity, id)",
+    "CREATE INDEX IF NOT EXISTS ix_medicine_expiration_date_id ON medicine (expiration_date, id)",
+    "CREATE INDEX IF NOT EXISTS ix_medicine_price_id ON medicine (price, id)",
+    "CREATE INDEX IF NOT EXISTS ix_medicine_type_fk ON medicine (type_id)",
+    "CREATE INDEX IF NOT EXISTS ix_medicine_supplier_fk ON medicine (supplier_id)",
+    "CREATE INDEX IF NOT EXISTS ix_stock_log_medicine_created ON stock_log (medicine_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_stock_log_medicine_id ON stock_log (medicine_id, id)",
+    # upsert korpe trazi jedinstven (user_id, medicine_id); duplikate prvo spajamo u jedan red
+    """
+    DO $$
+    BEGIN
+        IF to_regclass('shopping_cart') IS NOT NULL AND to_regclass('uq_shopping_cart_user_medicine') IS NULL THEN
+            UPDATE shopping_cart c SET quantity = d.total
+            FROM (
+                SELECT MIN(id) AS keep_id, SUM(quantity) AS total FROM shopping_cart
+                GROUP BY user_id, medicine_id HAVING COUNT(*) > 1
+            ) d
+            WHERE c.id = d.keep_id;
+            DELETE FROM shopping_cart c USING shopping_cart o
+            WHERE c.user_id = o.user_id AND c.medicine_id = o.medicine_id AND c.id > o.id;
+            ALTER TABLE shopping_cart ADD CONSTRAINT uq_shopping_cart_user_medicine UNIQUE (user_id, medicine_id);
+        END IF;
+    END $$
+    """,
+    "ALTER TABLE temperature_humidity_log ADD COLUMN IF NOT EXISTS device_id VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_temperature_humidity_log_device_id ON temperature_humidity_log (device_id)",
+    "CREATE INDEX IF NOT EXISTS ix_temperature_humidity_log_recorded_at ON temperature_humidity_log (recorded_at)",
+    # seq poruke je jedinstven u razgovoru; razgovore sa duplikatima prvo prenumerisemo redom upisa
+    """
+    DO $$
+    BEGIN
+        IF to_regclass('chat_message') IS NOT NULL AND to_regclass('uq_chat_message_conversation_seq') IS NULL THEN
+            UPDATE chat_message m SET seq = r.seq
+            FROM (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY conversation_id ORDER BY seq, id) - 1 AS seq
+                FROM chat_message
+                WHERE conversation_id IN (
+                    SELECT conversation_id FROM chat_message GROUP BY conversation_id, seq HAVING COUNT(*) > 1
+                )
+            ) r
+            WHERE m.id = r.id AND m.seq <> r.seq;
+            UPDATE chat_conversation c SET message_count = m.total
+            FROM (SELECT conversation_id, MAX(seq) + 1 AS total FROM chat_message GROUP BY conversation_id) m
+            WHERE c.id = m.conversation_id AND c.message_count < m.total;
+            DROP INDEX IF EXISTS ix_chat_message_conversation_seq;
+            ALTER TABLE chat_message ADD CONSTRAINT uq_chat_message_conversation_seq UNIQUE (conversation_id, seq);
+        END IF;
+    END $$
+    """,
+]
 
 async def init_db():
     async with engine.begin() as conn:
         
         await conn.run_sync(Base.metadata.create_all)
+        for statement in SCHEMA_UPDATES:
+            await conn.execute(text(statement))
 
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+def db_rejection(error: BaseException):
+    """``(type, message)`` when the database refused the statement itself, else None.
+
+    Connection errors return None: retrying them can succeed, retrying a
+    rejected statement cannot.
+    """
+    if isinstance(error, DBAPIError) and not error.connection_invalidated:
+        return type(error.orig).__name__, str(error.orig)
+    return None
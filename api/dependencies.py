@@ -4,6 +4,8 @@ from repositories.user_repository import get_user_by_username
 from services.auth import SECRET_KEY, ALGORITHM
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
+from services.principal_cache import principal_cache
+from models.user_models import RoleEnum
 
 async def get_current_user(
     access_token: str | None = Cookie(default=None),
@@ -26,7 +28,18 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    user = principal_cache.get(username)
+    if user is not None:
+        # u sesiju zahtjeva, da handler moze mijenjati i commitati korisnika
+        return await db.merge(user, load=False)
+
     user = await get_user_by_username(db, username)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    principal_cache.put(user)
+    return user
+
+async def require_administrator(user=Depends(get_current_user)):
+    if user.role != RoleEnum.administrator:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator access required")
+    return user
@@ -1,34 +1,45 @@
 from dotenv import load_dotenv
 from fastapi import FastAPI
 import os
-from database import init_db
+from database import init_db, get_db, AsyncSessionLocal
+from dependencies import get_current_user, require_administrator
+from sqlalchemy.ext.asyncio import AsyncSession
 from routers import auth_router as auth
 from fastapi.middleware.cors import CORSMiddleware
 from routers import technician_router as technician
 from routers import task_router as task
 from routers import medicine_router as medicine
 from models import user_models, medicine_models
-from fastapi.staticfiles import StaticFiles
+from static_files import ImmutableStaticFiles
 from routers import shopping_cart as shopping_cart
 import logging
 from routers import temperature_humidity as temp_humidity
 from routers import lookup as lookup
+from services.search_index import medicine_index
+from services.stock_ledger import backfill_opening_balances, run_snapshot_compaction
+from services.sensor_ingest import reading_buffer
+from services.sensor_rollups import backfill_rollups
+from services.sensor_archive import run_retention_loop
+from services.conversation_store import Conversation, SYSTEM_PROMPT, conversation_store
+from services.chat_provider import DEFAULT_PARAMS, make_provider
+from services.chat_cache import cache_key, response_cache
+from services.chat_inventory import answer_from_inventory
+from services.chat_context import build_messages, schedule_fold
+import asyncio
 from enum import Enum
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from groq import Groq
+from fastapi import Depends, FastAPI, HTTPException
+from pydantic import BaseModel, Field
+from fastapi.responses import StreamingResponse
+import json
 from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY environment variable is not set.")
-
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -39,6 +50,24 @@ app = FastAPI()
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    async with AsyncSessionLocal() as db:
+        await medicine_index.rebuild(db)
+    logger.info("Medicine search index built with %d entries", len(medicine_index))
+    async with AsyncSessionLocal() as db:
+        await backfill_opening_balances(db)
+    async with AsyncSessionLocal() as db:
+        await backfill_rollups(db)
+    app.state.snapshot_task = asyncio.create_task(run_snapshot_compaction())
+    app.state.sensor_archive_task = asyncio.create_task(run_retention_loop())
+    reading_buffer.start()
+    conversation_store.writes.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await reading_buffer.stop()
+    await conversation_store.writes.stop()
+    await chat_provider.aclose()
 
 origins = [
     "http://localhost:3000",   
@@ -53,99 +82,138 @@ app.add_middleware(
 )
 
 
-app.mount("/uploaded_images", StaticFiles(directory="uploaded_images"), name="uploaded_images")
+app.mount("/uploaded_images", ImmutableStaticFiles(directory="uploaded_images"), name="uploaded_images")
+
 
 
 
 
 
+chat_provider = make_provider(GROQ_API_KEY)
+
 
-client = Groq(api_key=GROQ_API_KEY)
 class UserInput(BaseModel):
     message: str
     role: str = "user"
-    conversation_id: str 
-
-class Conversation:
-    def __init__(self):
-        self.messages: List[Dict[str, str]] = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a helpful AI assistant specialized in pharmaceutical management. "
-                    "Always respond in English. Provide accurate information about medications, "
-                    "dosages, inventory management, prescriptions, and general pharmacy best practices. "
-                    "Keep answers clear, concise, and professional."
-                )
-            }
-        ]
-        self.active: bool = True
+    conversation_id: str = Field(..., max_length=64)
+    # zaobilazi cache odgovora (npr. kad korisnik trazi novi odgovor na isto pitanje)
+    no_cache: bool = False
 
 
-conversations: Dict[str, Conversation] = {}
-
-
-def query_groq_api(conversation: Conversation) -> str:
+async def query_groq_api(messages: List[Dict[str, str]]) -> str:
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=conversation.messages,
-            temperature=1,
-            max_tokens=1024,
-            top_p=1,
-            stream=True,
-            stop=None,
-        )
-        
-        response = ""
-        for chunk in completion:
-            response += chunk.choices[0].delta.content or ""
-        
-        return response
-    
+        return await chat_provider.complete(messages)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error with Groq API: {str(e)}")
 
 
-def get_or_create_conversation(conversation_id: str) -> Conversation:
-    if conversation_id not in conversations:
-        conversations[conversation_id] = Conversation()
-    return conversations[conversation_id]
-
-
-
-
-@app.post("/chat/")
-async def chat(input: UserInput):
-    conversation = get_or_create_conversation(input.conversation_id)
-
+async def get_or_create_conversation(conversation_id: str) -> Conversation:
+    # odbijamo prije odgovora, kasnije bi odgovor bio izgubljen
+    if conversation_store.writes.full:
+        raise HTTPException(status_code=503, detail="Chat is busy, retry later", headers={"Retry-After": "1"})
+    conversation = await conversation_store.get_or_create(conversation_id)
     if not conversation.active:
         raise HTTPException(
             status_code=400, 
             detail="The chat session has ended. Please start a new session."
         )
-        
-    try:
-        # Append the user's message to the conversation
-        conversation.messages.append({
-            "role": input.role,
-            "content": input.message
-        })
-        
-        response = query_groq_api(conversation)
-        
-        conversation.messages.append({
-            "role": "assistant",
-            "content": response
-        })
-        
-        return {
-            "response": response,
-            "conversation_id": input.conversation_id
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return conversation
+
+
+def response_cache_key(input: UserInput, conversation: Conversation) -> Optional[str]:
+    """Only first-turn questions are cached; later answers depend on the conversation."""
+    if input.no_cache or input.role != "user" or conversation.history or conversation.summary:
+        return None
+    return cache_key(input.message, chat_provider.model, DEFAULT_PARAMS, SYSTEM_PROMPT)
+
+
+def save_turn(input: UserInput, conversation: Conversation, response: str):
+    # poruke se cuvaju tek kad je odgovor kompletan, prekinut odgovor ne ostaje u historiji
+    conversation_store.append(input.conversation_id, conversation, input.role, input.message)
+    conversation_store.append(input.conversation_id, conversation, "assistant", response)
+    schedule_fold(chat_provider, input.conversation_id, conversation)
+
+
+async def prepare_chat(input: UserInput, conversation: Conversation):
+    """Returns ``(answer, messages, cache_key)``; ``answer`` is set when no model call is needed."""
+    if input.role == "user":
+        answer, context = await answer_from_inventory(input.message)
+    else:
+        answer, context = None, None
+    if answer is not None:
+        return answer, None, None
+
+    messages, _ = build_messages(conversation, input.role, input.message)
+    if context:
+        # podaci iz baze samo za ovaj poziv, ne ulaze u historiju ni u cache
+        messages.insert(-1, {"role": "system", "content": context})
+        return None, messages, None
+
+    key = response_cache_key(input, conversation)
+    cached = response_cache.get(key) if key else None
+    return cached, messages, key
+
+
+@app.post("/chat/")
+async def chat(input: UserInput, current_user=Depends(get_current_user)):
+    conversation = await get_or_create_conversation(input.conversation_id)
+    response, messages, key = await prepare_chat(input, conversation)
+    if response is None:
+        response = await query_groq_api(messages)
+        if key:
+            response_cache.put(key, response)
+    save_turn(input, conversation, response)
+
+    return {
+        "response": response,
+        "conversation_id": input.conversation_id
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(input: UserInput, current_user=Depends(get_current_user),
+                      db: AsyncSession = Depends(get_db)):
+    """Same as ``/chat/`` but streams the answer as server-sent ``token`` events."""
+    # konekcija iz provjere korisnika ne smije ostati zauzeta dok traje odgovor
+    await db.close()
+    conversation = await get_or_create_conversation(input.conversation_id)
+    ready, messages, key = await prepare_chat(input, conversation)
+
+    async def events():
+        if ready is not None:
+            save_turn(input, conversation, ready)
+            yield _sse("token", {"content": ready})
+            yield _sse("done", {"conversation_id": input.conversation_id})
+            return
+        parts = []
+        try:
+            async for delta in chat_provider.stream(messages):
+                parts.append(delta)
+                yield _sse("token", {"content": delta})
+        except Exception as e:
+            logger.exception("Chat stream failed")
+            yield _sse("error", {"detail": f"Error with Groq API: {str(e)}"})
+            return
+        response = "".join(parts)
+        if key:
+            response_cache.put(key, response)
+        save_turn(input, conversation, response)
+        yield _sse("done", {"conversation_id": input.conversation_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/chat/stats")
+async def chat_stats(user=Depends(require_administrator)):
+    return {**conversation_store.stats(), "response_cache": response_cache.stats()}
     
 
 # Include routers
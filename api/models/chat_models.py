@@ -0,0 +1,33 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
+from database import Base
+
+
+class ChatConversation(Base):
+    __tablename__ = "chat_conversation"
+
+    id = Column(String(64), primary_key=True)
+    active = Column(Boolean, nullable=False, default=True)
+    # rolling summary poruka sa seq < summarized_upto
+    summary = Column(Text, nullable=False, default="")
+    summarized_upto = Column(Integer, nullable=False, default=0)
+    message_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_active_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ChatMessage(Base):
+    """Append-only; ``seq`` is the message's position within its conversation."""
+    __tablename__ = "chat_message"
+
+    id = Column(BigInteger, primary_key=True)
+    conversation_id = Column(String(64), ForeignKey("chat_conversation.id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    role = Column(String(20), nullable=False)
+    content = Column(Text, nullable=False)
+    tokens = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("conversation_id", "seq", name="uq_chat_message_conversation_seq"),
+    )
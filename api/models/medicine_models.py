@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, DateTime, Float, Index, func
 from sqlalchemy.orm import relationship
 from database import Base
 from models.lookup import MedicineType, Supplier
@@ -29,6 +29,24 @@ class Medicine(Base):
     stock_logs = relationship(
         "StockLog", back_populates="medicine", cascade="all, delete-orphan"
     )
+    stock_snapshots = relationship(
+        "StockSnapshot", back_populates="medicine", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+# prefiks pretraga po imenu (lower(name) LIKE 'abc%') i keyset sortiranje
+Index(
+    "ix_medicine_name_lower",
+    func.lower(Medicine.name).label("name_lower"),
+    postgresql_ops={"name_lower": "text_pattern_ops"},
+)
+Index("ix_medicine_name_id", Medicine.name, Medicine.id)
+Index("ix_medicine_quantity_id", Medicine.quantity, Medicine.id)
+Index("ix_medicine_expiration_date_id", Medicine.expiration_date, Medicine.id)
+Index("ix_medicine_price_id", Medicine.price, Medicine.id)
+# index=True bi dao ime ix_medicine_type_id, koje vec ima indeks na medicine_type.id
+Index("ix_medicine_type_fk", Medicine.type_id)
+Index("ix_medicine_supplier_fk", Medicine.supplier_id)
 
 
 class StockLog(Base):
@@ -41,3 +59,27 @@ class StockLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     medicine = relationship("Medicine", back_populates="stock_logs")
+
+    __table_args__ = (
+        Index("ix_stock_log_medicine_created", "medicine_id", "created_at"),
+        Index("ix_stock_log_medicine_id", "medicine_id", "id"),
+    )
+
+
+class StockSnapshot(Base):
+    """Compacted stock level: quantity after every StockLog up to ``last_log_id``."""
+    __tablename__ = "stock_snapshot"
+
+    id = Column(Integer, primary_key=True, index=True)
+    medicine_id = Column(Integer, ForeignKey("medicine.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    last_log_id = Column(Integer, nullable=False)
+    as_of = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    medicine = relationship("Medicine", back_populates="stock_snapshots")
+
+    __table_args__ = (
+        Index("ix_stock_snapshot_medicine_as_of", "medicine_id", "as_of"),
+        Index("ix_stock_snapshot_medicine_last_log", "medicine_id", "last_log_id"),
+    )
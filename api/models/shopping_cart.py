@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 from models.user_models import User
@@ -18,6 +18,10 @@ class ShoppingCart(Base):
     user = relationship("User", back_populates="shopping_cart_items")
     medicine = relationship("Medicine", back_populates="shopping_cart_items")
 
+    __table_args__ = (
+        UniqueConstraint("user_id", "medicine_id", name="uq_shopping_cart_user_medicine"),
+    )
+
 
 
 User.shopping_cart_items = relationship(
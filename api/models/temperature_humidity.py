@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, Float, DateTime
+from sqlalchemy import Boolean, Column, Integer, Float, DateTime, String
 from database import Base
 
 class TemperatureHumidityLog(Base):
@@ -8,4 +8,35 @@ class TemperatureHumidityLog(Base):
     id = Column(Integer, primary_key=True, index=True)
     temperature = Column(Float, nullable=False)
     humidity = Column(Float, nullable=False)
-    recorded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    recorded_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    device_id = Column(String, nullable=True, index=True)
+
+
+class TemperatureHumidityRollup(Base):
+    """Per-bucket aggregates of TemperatureHumidityLog (resolution: minute, hour or day)."""
+    __tablename__ = "temperature_humidity_rollup"
+
+    resolution = Column(String(10), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    temperature_min = Column(Float, nullable=False)
+    temperature_max = Column(Float, nullable=False)
+    temperature_sum = Column(Float, nullable=False)
+    humidity_min = Column(Float, nullable=False)
+    humidity_max = Column(Float, nullable=False)
+    humidity_sum = Column(Float, nullable=False)
+
+
+class AlertRule(Base):
+    """Storage-condition rule: a min/max threshold and/or a maximum rate of change (per minute)."""
+    __tablename__ = "sensor_alert_rule"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)
+    metric = Column(String(20), nullable=False)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+    max_rate = Column(Float, nullable=True)
+    device_id = Column(String, nullable=True)
+    is_active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
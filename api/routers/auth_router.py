@@ -18,6 +18,10 @@ from services.auth import (
 )
 from database import get_db
 from dependencies import get_current_user
+from services.principal_cache import principal_cache
+from jose import jwt, JWTError
+from services.auth import SECRET_KEY, ALGORITHM
+from fastapi import Cookie
 
 router = APIRouter(tags=["Authentication"])
 
@@ -32,7 +36,7 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     if existing_email:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_data = user.dict(exclude={"password"})
     user_data["hashed_password"] = hashed_password
     new_user = await create_user(db, user_data)
@@ -69,7 +73,13 @@ async def login_user(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/logout")
-async def logout_user(response: Response):
+async def logout_user(response: Response, access_token: str | None = Cookie(default=None)):
+    if access_token:
+        try:
+            payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
+            principal_cache.invalidate(payload.get("sub"))
+        except JWTError:
+            pass
     response.delete_cookie("access_token")
     return {"message": "Successfully logged out"}
 
@@ -95,12 +105,12 @@ async def update_user_profile(
 
         # Update password if provided
         if update_data.password_data:
-            if not verify_password(update_data.password_data.old_password, current_user.hashed_password):
+            if not await verify_password(update_data.password_data.old_password, current_user.hashed_password):
                 raise HTTPException(
                     status_code=400,
                     detail="Current password is incorrect"
                 )
-            current_user.hashed_password = get_password_hash(update_data.password_data.new_password)
+            current_user.hashed_password = await get_password_hash(update_data.password_data.new_password)
 
         # Update other fields
         update_dict = update_data.dict(exclude_unset=True, exclude={'password_data'})
@@ -110,9 +120,13 @@ async def update_user_profile(
         db.add(current_user)
         await db.commit()
         await db.refresh(current_user)
+        principal_cache.invalidate(current_user.username)
         
         return current_user
 
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(
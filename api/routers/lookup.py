@@ -3,6 +3,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from database import get_db as get_async_db
 from models.medicine_models import MedicineType, Supplier
+from services.versioning import bump_version, conditional_get
+from services import lookup_service
 from schemas.lookup import (
     MedicineTypeCreate, MedicineTypeUpdate, MedicineTypeOut,
     SupplierCreate, SupplierUpdate, SupplierOut
@@ -11,17 +13,22 @@ from schemas.lookup import (
 router = APIRouter(prefix="/lookup", tags=["Lookup"])
 
 
-@router.get("/medicine-types", response_model=list[MedicineTypeOut])
+@router.get(
+    "/medicine-types",
+    response_model=list[MedicineTypeOut],
+    dependencies=[Depends(conditional_get(MedicineType.__tablename__))],
+)
 async def get_medicine_types(db: AsyncSession = Depends(get_async_db)):
-    result = await db.execute(select(MedicineType))
-    return result.scalars().all()
+    return await lookup_service.get_medicine_types(db)
 
 
 @router.post("/medicine-types", response_model=MedicineTypeOut)
 async def create_medicine_type(data: MedicineTypeCreate, db: AsyncSession = Depends(get_async_db)):
     new_type = MedicineType(**data.dict())
     db.add(new_type)
+    await bump_version(db, MedicineType.__tablename__)
     await db.commit()
+    await lookup_service.invalidate_medicine_types()
     await db.refresh(new_type)
     return new_type
 
@@ -36,7 +43,9 @@ async def update_medicine_type(id: int, data: MedicineTypeUpdate, db: AsyncSessi
     for key, value in data.dict(exclude_unset=True).items():
         setattr(mt, key, value)
 
+    await bump_version(db, MedicineType.__tablename__)
     await db.commit()
+    await lookup_service.invalidate_medicine_types()
     await db.refresh(mt)
     return mt
 
@@ -48,22 +57,29 @@ async def delete_medicine_type(id: int, db: AsyncSession = Depends(get_async_db)
     if not mt:
         raise HTTPException(status_code=404, detail="MedicineType not found")
     await db.delete(mt)
+    await bump_version(db, MedicineType.__tablename__)
     await db.commit()
+    await lookup_service.invalidate_medicine_types()
     return {"detail": "Deleted successfully"}
 
 
 
-@router.get("/suppliers", response_model=list[SupplierOut])
+@router.get(
+    "/suppliers",
+    response_model=list[SupplierOut],
+    dependencies=[Depends(conditional_get(Supplier.__tablename__))],
+)
 async def get_suppliers(db: AsyncSession = Depends(get_async_db)):
-    result = await db.execute(select(Supplier))
-    return result.scalars().all()
+    return await lookup_service.get_suppliers(db)
 
 
 @router.post("/suppliers", response_model=SupplierOut)
 async def create_supplier(data: SupplierCreate, db: AsyncSession = Depends(get_async_db)):
     new_supplier = Supplier(**data.dict())
     db.add(new_supplier)
+    await bump_version(db, Supplier.__tablename__)
     await db.commit()
+    await lookup_service.invalidate_suppliers()
     await db.refresh(new_supplier)
     return new_supplier
 
@@ -78,7 +94,9 @@ async def update_supplier(id: int, data: SupplierUpdate, db: AsyncSession = Depe
     for key, value in data.dict(exclude_unset=True).items():
         setattr(s, key, value)
 
+    await bump_version(db, Supplier.__tablename__)
     await db.commit()
+    await lookup_service.invalidate_suppliers()
     await db.refresh(s)
     return s
 
@@ -90,5 +108,7 @@ async def delete_supplier(id: int, db: AsyncSession = Depends(get_async_db)):
     if not s:
         raise HTTPException(status_code=404, detail="Supplier not found")
     await db.delete(s)
+    await bump_version(db, Supplier.__tablename__)
     await db.commit()
+    await lookup_service.invalidate_suppliers()
     return {"detail": "Deleted successfully"}
@@ -1,38 +1,150 @@
 # routers/medicine_router.py
-from fastapi import APIRouter, Depends, HTTPException
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import date, datetime, timedelta
+from typing import List, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from fastapi.responses import StreamingResponse
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import Table, TableStyle, SimpleDocTemplate
-from reportlab.lib import colors
+from starlette.concurrency import run_in_threadpool
 from fastapi import UploadFile, File, Form
-import shutil
 import os
 from sqlalchemy import and_
 
 from models.lookup import MedicineType
 from database import get_db
-from models.medicine_models import Medicine
+from models.medicine_models import Medicine, StockLog
 from dependencies import get_current_user
-
-from schemas.medicine import MedicineCreate, MedicineUpdate, MedicineOut
-from services.medicine_services import get_medicines, get_medicine, create_medicine, update_medicine, delete_medicine
+from services.time_utils import to_naive_utc
+
+from schemas.medicine import (
+    MedicineCreate, MedicineUpdate, MedicineOut, MedicinePage, MedicineSortKey, SortOrder,
+    MedicineSearchHit, SearchMode, MedicineImportResult, ExpirySummary, StockLevel, StockMovement
+)
+from services.medicine_services import (
+    get_medicines, get_medicine, create_medicine, update_medicine, delete_medicine,
+    list_medicines_page, InvalidCursor, LISTABLE_FIELDS, parse_medicine_import, bulk_import_medicines
+)
+from services.search_index import medicine_index
+from services.report_service import medicine_pdf_chunks
+from services.image_service import store_image
+from services.expiry_service import EXPIRING_SOON_DAYS, expiring_soon_query, get_expiry_summary
+from services.export_service import export_response
+from services.stock_ledger import (
+    record_stock_change, stock_at, stock_movement, REASON_INITIAL, REASON_ADJUSTMENT
+)
+from services.versioning import bump_version, conditional_get
+from services import lookup_service
+from schemas.export import ExportFormat
 
 
 router = APIRouter(prefix="/medicine", tags=["Medicine"])
 
-UPLOAD_DIR = "uploaded_images"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+SEARCH_DETAIL_FIELDS = (
+    Medicine.dosage_form, Medicine.quantity, Medicine.expiration_date, Medicine.price, Medicine.image_path,
+)
+
+
+@router.get("/", response_model=MedicinePage, response_model_exclude_unset=True)
+async def get_all_medicines(
+    name: Optional[str] = Query(None, description="Name prefix (case-insensitive)"),
+    type_id: Optional[int] = None,
+    supplier_id: Optional[int] = None,
+    min_quantity: Optional[int] = Query(None, ge=0),
+    max_quantity: Optional[int] = Query(None, ge=0),
+    expires_after: Optional[date] = None,
+    expires_before: Optional[date] = None,
+    sort: MedicineSortKey = MedicineSortKey.name,
+    order: SortOrder = SortOrder.asc,
+    fields: Optional[str] = Query(None, description="Comma separated list of columns to return"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+    not_modified=Depends(conditional_get(Medicine.__tablename__))
+):
+    requested_fields = None
+    if fields:
+        requested_fields = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested_fields if f not in LISTABLE_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    try:
+        items, next_cursor = await list_medicines_page(
+            db,
+            name_prefix=name,
+            type_id=type_id,
+            supplier_id=supplier_id,
+            min_quantity=min_quantity,
+            max_quantity=max_quantity,
+            expires_after=expires_after,
+            expires_before=expires_before,
+            sort=sort,
+            order=order,
+            fields=requested_fields,
+            cursor=cursor,
+            limit=limit,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-@router.get("/")
-async def get_all_medicines(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
-    result = await db.execute(select(Medicine))
-    medicines = result.scalars().all()
-    return medicines
+    return MedicinePage(items=items, next_cursor=next_cursor)
+
+@router.get("/search", response_model=List[MedicineSearchHit])
+async def search_medicines(
+    q: str = Query(..., min_length=1, max_length=100),
+    mode: SearchMode = SearchMode.prefix,
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    await medicine_index.refresh(db)
+    hits = medicine_index.search(q, mode=mode.value, limit=limit)
+    if not hits:
+        return hits
+    result = await db.execute(
+        select(Medicine.id, *SEARCH_DETAIL_FIELDS).where(Medicine.id.in_([hit["id"] for hit in hits]))
+    )
+    details = {row.id: row._mapping for row in result.all()}
+    # pogodak obrisan nakon obnove indeksa se preskace
+    return [{**hit, **details[hit["id"]]} for hit in hits if hit["id"] in details]
+
+@router.get("/export")
+async def export_medicines(
+    format: ExportFormat = ExportFormat.csv,
+    current_user=Depends(get_current_user)
+):
+    stmt = select(
+        Medicine.id,
+        Medicine.name,
+        Medicine.description,
+        Medicine.manufacturer,
+        Medicine.dosage_form,
+        Medicine.strength,
+        Medicine.quantity,
+        Medicine.expiration_date,
+        Medicine.type_id,
+        Medicine.supplier_id,
+        Medicine.price,
+        Medicine.image_path,
+    ).order_by(Medicine.id)
+    return export_response(stmt, format, "medicines")
+
+
+@router.get("/stock-logs/export")
+async def export_stock_logs(
+    format: ExportFormat = ExportFormat.csv,
+    current_user=Depends(get_current_user)
+):
+    stmt = select(
+        StockLog.id,
+        StockLog.medicine_id,
+        StockLog.change,
+        StockLog.reason,
+        StockLog.created_at,
+    ).order_by(StockLog.id)
+    return export_response(stmt, format, "stock_logs")
 
 @router.post("/", response_model=MedicineOut)
 async def add_medicine(
@@ -54,6 +166,8 @@ async def add_medicine(
         except ValueError:
             raise HTTPException(status_code=400, detail="Expiration date must be YYYY-MM-DD")
 
+    image_path = await store_image(file) if file else None
+
     db_med = Medicine(
         name=name,
         dosage_form=dosage_form,
@@ -62,25 +176,42 @@ async def add_medicine(
         expiration_date=exp_date_obj,
         type_id=type_id,
         price=price,
-        image_path=None
+        image_path=image_path
     )
     db.add(db_med)
+    await db.flush()
+    record_stock_change(db, db_med.id, db_med.quantity, REASON_INITIAL)
+    await bump_version(db, Medicine.__tablename__)
     await db.commit()
     await db.refresh(db_med)
+    return db_med
+
 
-    if file:
-        extension = os.path.splitext(file.filename)[1]
-        file_path = os.path.join(UPLOAD_DIR, f"medicine_{db_med.id}{extension}")
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        db_med.image_path = file_path
-        db.add(db_med)
-        await db.commit()
-        await db.refresh(db_med)
 
-    return db_med
 
+@router.post("/import", response_model=MedicineImportResult)
+async def import_medicines(
+    file: UploadFile = File(...),
+    format: Optional[ExportFormat] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    if format is None:
+        extension = os.path.splitext(file.filename or "")[1].lower()
+        format = ExportFormat.ndjson if extension in (".ndjson", ".jsonl") else ExportFormat.csv
+
+    # parsiranje i validacija su CPU posao, ne blokiramo event loop
+    rows, errors = await run_in_threadpool(parse_medicine_import, file.file, format)
+
+    inserted = updated = 0
+    if rows:
+        try:
+            inserted, updated = await bulk_import_medicines(db, rows, errors)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Import failed, nothing was written: {str(e)}")
 
+    errors.sort(key=lambda error: error.row)
+    return MedicineImportResult(inserted=inserted, updated=updated, errors=errors)
 
 
 @router.put("/{medicine_id}", response_model=dict)
@@ -97,11 +228,13 @@ async def edit_medicine(
     db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    # Dohvati lijek
-    med = await db.get(Medicine, medicine_id)
+    # Dohvati lijek (zakljucan, da promjena zalihe u ledgeru bude tacna)
+    med = await db.get(Medicine, medicine_id, with_for_update=True)
     if not med:
         raise HTTPException(status_code=404, detail="Medicine not found")
 
+    record_stock_change(db, med.id, quantity - med.quantity, REASON_ADJUSTMENT)
+
     # Update polja
     med.name = name
     med.dosage_form = dosage_form
@@ -118,13 +251,10 @@ async def edit_medicine(
 
     # Ako postoji novi fajl
     if file:
-        extension = os.path.splitext(file.filename)[1]
-        file_path = os.path.join(UPLOAD_DIR, f"medicine_{med.id}{extension}")
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        med.image_path = file_path
+        med.image_path = await store_image(file)
 
     db.add(med)
+    await bump_version(db, Medicine.__tablename__)
     await db.commit()
     await db.refresh(med)
 
@@ -140,6 +270,43 @@ async def edit_medicine(
         "image_path": med.image_path
     }
 
+@router.get("/{medicine_id}/stock", response_model=StockLevel)
+async def get_stock_at(
+    medicine_id: int,
+    at: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    if not await db.get(Medicine, medicine_id):
+        raise HTTPException(status_code=404, detail="Medicine not found")
+    at = to_naive_utc(at) if at else datetime.utcnow()
+    return StockLevel(medicine_id=medicine_id, at=at, quantity=await stock_at(db, medicine_id, at))
+
+
+@router.get("/{medicine_id}/stock-movement", response_model=StockMovement)
+async def get_stock_movement(
+    medicine_id: int,
+    start: datetime,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    if not await db.get(Medicine, medicine_id):
+        raise HTTPException(status_code=404, detail="Medicine not found")
+    start = to_naive_utc(start)
+    end = to_naive_utc(end) if end else datetime.utcnow()
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    by_reason = await stock_movement(db, medicine_id, start, end)
+    return StockMovement(
+        medicine_id=medicine_id,
+        start=start,
+        end=end,
+        net_change=sum(by_reason.values()),
+        by_reason=by_reason,
+    )
+
+
 @router.delete("/{medicine_id}")
 async def remove_medicine(medicine_id: int, db: AsyncSession = Depends(get_db)):
     db_med = await get_medicine(db, medicine_id)
@@ -149,58 +316,31 @@ async def remove_medicine(medicine_id: int, db: AsyncSession = Depends(get_db)):
     return {"message": "Medicine deleted successfully"}
 
 
-@router.get("/medicine-type/")
+@router.get("/medicine-type/", dependencies=[Depends(conditional_get(MedicineType.__tablename__))])
 async def get_medicine_types(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(MedicineType))
-    medicine_types = result.scalars().all()
-    return medicine_types
+    return await lookup_service.get_medicine_types(db)
 
 
 @router.get("/expiring-soon")
-async def get_medicines_expiring_soon(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
-   
-    today = datetime.today().date()
-    three_months_later = today + timedelta(days=90)  # približno 3 mjeseca
-
-    
-    stmt = select(Medicine).where(
-        and_(
-            Medicine.expiration_date != None,
-            Medicine.expiration_date.between(today, three_months_later)
-        )
-    )
-
-    result = await db.execute(stmt)
+async def get_medicines_expiring_soon(
+    days: int = Query(EXPIRING_SOON_DAYS, ge=1, le=3650),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    result = await db.execute(expiring_soon_query(datetime.today().date(), days))
     medicines = result.scalars().all()
     return medicines
 
-@router.get("/pdf")
-async def generate_medicine_pdf(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
-    result = await db.execute(select(Medicine))
-    medicines = result.scalars().all()
 
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    data = [["Name", "Form", "Strength", "Quantity", "Expiration Date"]]
-
-    for med in medicines:
-        data.append([
-            med.name,
-            med.dosage_form or "-",
-            med.strength or "-",
-            med.quantity,
-            med.expiration_date.strftime("%Y-%m-%d") if med.expiration_date else "-"
-        ])
-
-    table = Table(data, colWidths=[120, 80, 80, 60, 100])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.lightblue),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('ALIGN', (3,1), (-1,-1), 'CENTER')
-    ]))
-
-    doc.build([table])
-    buffer.seek(0)
-    return StreamingResponse(buffer, media_type="application/pdf", headers={"Content-Disposition": "inline; filename=medicines.pdf"})
+@router.get("/expiry-summary", response_model=ExpirySummary)
+async def get_medicine_expiry_summary(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    return await get_expiry_summary(db)
+
+@router.get("/pdf")
+async def generate_medicine_pdf(current_user=Depends(get_current_user)):
+    """The catalogue as a PDF, built in memory off the event loop and sent in chunks."""
+    return StreamingResponse(
+        medicine_pdf_chunks(),
+        media_type="application/pdf",
+        headers={"Content-Disposition": "inline; filename=medicines.pdf"}
+    )
@@ -1,13 +1,18 @@
+from collections import defaultdict
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import delete, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import List
 from models.medicine_models import Medicine
 from database import get_db as get_async_db
 from models.shopping_cart import ShoppingCart
-from schemas.shopping_cart import ShoppingCartCreate, ShoppingCartResponse, ShoppingCartResponseWithMedicine
+from schemas.shopping_cart import ShoppingCartCreate, ShoppingCartResponse, ShoppingCartResponseWithMedicine, CartBatch, CartSummary
 from dependencies import get_current_user
 from sqlalchemy.orm import selectinload
+from services.versioning import bump_version
+from services.stock_ledger import record_stock_changes, REASON_SALE
+from services.cart_service import apply_cart_batch, get_cart_summary, upsert_cart_items
 router = APIRouter(prefix="/shopping-cart", tags=["Shopping Cart"])
 
 
@@ -20,36 +25,15 @@ async def add_to_cart(
     user_id = current_user.id
 
     try:
-        result = await db.execute(
-            select(ShoppingCart)
-            .options(selectinload(ShoppingCart.medicine))
-            .filter_by(user_id=user_id, medicine_id=item.medicine_id)
-        )
-        existing_item = result.scalar_one_or_none()
-
-        if existing_item:
-            existing_item.quantity += item.quantity
-            await db.commit()
-            await db.refresh(existing_item)
-            return existing_item
-
-        cart_item = ShoppingCart(
-            user_id=user_id,
-            medicine_id=item.medicine_id,
-            quantity=item.quantity
-        )
-        db.add(cart_item)
+        await upsert_cart_items(db, user_id, {item.medicine_id: item.quantity}, replace=False)
         await db.commit()
-        await db.refresh(cart_item)
-        
+
         result = await db.execute(
             select(ShoppingCart)
             .options(selectinload(ShoppingCart.medicine))
-            .filter_by(id=cart_item.id)
+            .filter_by(user_id=user_id, medicine_id=item.medicine_id)
         )
-        cart_item_with_medicine = result.scalar_one()
-        
-        return cart_item_with_medicine
+        return result.scalar_one()
         
     except Exception as e:
         await db.rollback()
@@ -57,6 +41,31 @@ async def add_to_cart(
 
 
 
+@router.post("/batch", response_model=CartSummary)
+async def batch_update_cart(
+    batch: CartBatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user)
+):
+    try:
+        await apply_cart_batch(db, current_user.id, batch.operations)
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error updating cart: {str(e)}")
+    return await get_cart_summary(db, current_user.id)
+
+
+@router.get("/summary", response_model=CartSummary)
+async def get_cart_with_totals(
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user)
+):
+    return await get_cart_summary(db, current_user.id)
+
+
 @router.get("/", response_model=List[ShoppingCartResponseWithMedicine])
 async def get_cart(
     db: AsyncSession = Depends(get_async_db),
@@ -103,29 +112,58 @@ async def checkout(
 ):
     user_id = current_user.id
 
-    result = await db.execute(select(ShoppingCart).filter_by(user_id=user_id))
-    cart_items = result.scalars().all()
+    result = await db.execute(
+        select(ShoppingCart.id, ShoppingCart.medicine_id, ShoppingCart.quantity).filter_by(user_id=user_id)
+    )
+    cart_items = result.all()
 
     if not cart_items:
         raise HTTPException(status_code=400, detail="Cart is empty")
 
+    requested = defaultdict(int)
     for item in cart_items:
-        # provjeri dostupnu količinu lijeka
-        med_result = await db.execute(select(Medicine).filter_by(id=item.medicine_id))
-        medicine = med_result.scalar_one_or_none()
-        if not medicine:
-            raise HTTPException(status_code=404, detail="Medicine not found")
-        if medicine.quantity < item.quantity:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Not enough stock for {medicine.name}. Available: {medicine.quantity}",
-            )
-
-        # umanji količinu u tabeli medicine
-        medicine.quantity -= item.quantity
-
-        # ukloni item iz korpe
-        await db.delete(item)
+        requested[item.medicine_id] += item.quantity
+
+    # jedan UPDATE za sve stavke; redovi se zakljucavaju po id-u da paralelni
+    # checkouti ne zavrse u deadlocku, a uslov quantity >= qty sprjecava oversell
+    result = await db.execute(text("""
+        WITH requested AS (
+            SELECT * FROM unnest(CAST(:ids AS integer[]), CAST(:quantities AS integer[])) AS r(medicine_id, qty)
+        ),
+        locked AS (
+            SELECT m.id FROM medicine m
+            WHERE m.id IN (SELECT medicine_id FROM requested)
+            ORDER BY m.id
+            FOR UPDATE
+        )
+        UPDATE medicine m
+        SET quantity = m.quantity - r.qty
+        FROM requested r
+        WHERE m.id = r.medicine_id
+          AND m.id IN (SELECT id FROM locked)
+          AND m.quantity >= r.qty
+        RETURNING m.id
+    """), {"ids": list(requested.keys()), "quantities": list(requested.values())})
+    updated = set(result.scalars().all())
+
+    if len(updated) != len(requested):
+        await db.rollback()
+        missing = [medicine_id for medicine_id in requested if medicine_id not in updated]
+        result = await db.execute(
+            select(Medicine.id, Medicine.name, Medicine.quantity).where(Medicine.id.in_(missing))
+        )
+        available = {row.id: row for row in result.all()}
+        for medicine_id in missing:
+            if medicine_id not in available:
+                raise HTTPException(status_code=404, detail="Medicine not found")
+        medicine = available[missing[0]]
+        raise HTTPException(
+            status_code=400,
+            detail=f"Not enough stock for {medicine.name}. Available: {medicine.quantity}",
+        )
 
+    await record_stock_changes(db, [(medicine_id, -qty) for medicine_id, qty in requested.items()], REASON_SALE)
+    await db.execute(delete(ShoppingCart).where(ShoppingCart.id.in_([item.id for item in cart_items])))
+    await bump_version(db, Medicine.__tablename__)
     await db.commit()
     return {"detail": "Purchase successful! Stock updated."}
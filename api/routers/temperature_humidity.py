@@ -1,65 +1,280 @@
-import io
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from pydantic import ValidationError
 from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from database import get_db as get_async_db
-from models.temperature_humidity import TemperatureHumidityLog
-from schemas.temperature_humidity import TemperatureHumidity, TemperatureHumidityCreate, TemperatureHumidityUpdate
+from models.temperature_humidity import TemperatureHumidityLog, AlertRule
+from schemas.temperature_humidity import (
+    TemperatureHumidity, TemperatureHumidityCreate, TemperatureHumidityUpdate,
+    SensorReading, IngestError, IngestResult, Resolution, RangeResult,
+    AlertRule as AlertRuleSchema, AlertRuleCreate, AlertRuleUpdate
+)
+from services.sensor_alerts import alert_engine, alert_broadcaster, check_readings, store_alert_notifications
+from dependencies import require_administrator
+from services.sensor_rollups import apply_rollups, rebuild_rollups_around, query_range
+from services.sensor_ingest import reading_buffer, BufferFull
+from services.sensor_archive import all_readings, find_archived, latest_readings
+from services.time_utils import to_naive_utc
 from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from services.report_service import temperature_pdf_chunks
+from services.export_service import export_batches_response
+from services.versioning import bump_version, conditional_get
+from schemas.export import ExportFormat
 
 router = APIRouter(prefix="/temperature-humidity", tags=["TemperatureHumidity"])
 
 @router.get("/pdf")
-async def generate_pdf(db: AsyncSession = Depends(get_async_db)):
-    result = await db.execute(select(TemperatureHumidityLog).order_by(TemperatureHumidityLog.recorded_at.desc()))
-    logs = result.scalars().all()
-
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(200, 750, "Temperature & Humidity Logs")
-    
-    c.setFont("Helvetica", 12)
-    y = 720
-    for log in logs:
-        c.drawString(50, y, f"{log.id} | Temp: {log.temperature}°C | Humidity: {log.humidity}% | {log.recorded_at}")
-        y -= 20
-        if y < 50:
-            c.showPage()
-            y = 750
-
-    c.save()
-    buffer.seek(0)
-    return StreamingResponse(buffer, media_type="application/pdf", headers={"Content-Disposition": "inline; filename=temperature_humidity.pdf"})
-@router.get("/", response_model=list[TemperatureHumidity])
-async def read_logs(db: AsyncSession = Depends(get_async_db)):
-    result = await db.execute(select(TemperatureHumidityLog).order_by(TemperatureHumidityLog.recorded_at.desc()))
-    logs = result.scalars().all()
-    return logs
+async def generate_pdf():
+    """All readings as a PDF, built in memory off the event loop and sent in chunks."""
+    return StreamingResponse(
+        temperature_pdf_chunks(),
+        media_type="application/pdf",
+        headers={"Content-Disposition": "inline; filename=temperature_humidity.pdf"}
+    )
+
+MAX_INGEST_READINGS = 50000
+MAX_REPORTED_ERRORS = 100
+# jedno ocitanje je ~100 bajtova; granice stite od beskonacnog tijela ili linije bez \n
+MAX_INGEST_LINE_BYTES = 4096
+MAX_INGEST_BODY_BYTES = 16 * 1024 * 1024
+
+
+def _too_large(detail: str):
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+
+async def _ndjson_lines(request: Request):
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_INGEST_BODY_BYTES:
+        raise _too_large(f"Request body is limited to {MAX_INGEST_BODY_BYTES} bytes")
+    # nedovrsena linija se dopunjava u mjestu, novi chunk se ne lijepi na cijeli buffer
+    pending = bytearray()
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_INGEST_BODY_BYTES:
+            raise _too_large(f"Request body is limited to {MAX_INGEST_BODY_BYTES} bytes")
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            pending += chunk[start:end]
+            if len(pending) > MAX_INGEST_LINE_BYTES:
+                raise _too_large(f"Lines are limited to {MAX_INGEST_LINE_BYTES} bytes")
+            yield bytes(pending)
+            pending.clear()
+            start = end + 1
+        pending += chunk[start:]
+        if len(pending) > MAX_INGEST_LINE_BYTES:
+            raise _too_large(f"Lines are limited to {MAX_INGEST_LINE_BYTES} bytes")
+    if pending:
+        yield bytes(pending)
+
+
+@router.post("/ingest", response_model=IngestResult, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_readings(request: Request, background_tasks: BackgroundTasks):
+    """Accept an NDJSON batch of readings; rows are written by the background buffer."""
+    rows = []
+    errors = []
+    rejected = 0
+    line_no = 0
+    async for line in _ndjson_lines(request):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            reading = SensorReading(**json.loads(line))
+        except (ValueError, TypeError, ValidationError) as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(IngestError(line=line_no, error=str(e)))
+            continue
+        if len(rows) >= MAX_INGEST_READINGS:
+            raise _too_large(f"At most {MAX_INGEST_READINGS} readings per request")
+        rows.append({
+            "device_id": reading.device_id,
+            "temperature": reading.temperature,
+            "humidity": reading.humidity,
+            "recorded_at": to_naive_utc(reading.recorded_at) if reading.recorded_at else datetime.utcnow(),
+        })
+
+    try:
+        reading_buffer.add(rows)
+    except BufferFull:
+        raise HTTPException(status_code=503, detail="Ingestion buffer is full, retry later", headers={"Retry-After": "1"})
+
+    events = await check_readings(rows)
+    if events:
+        background_tasks.add_task(store_alert_notifications, events)
+
+    return IngestResult(accepted=len(rows), rejected=rejected, errors=errors)
+
+
+@router.get("/range", response_model=RangeResult)
+async def read_range(
+    start: datetime,
+    end: Optional[datetime] = None,
+    resolution: Resolution = Resolution.auto,
+    points: Optional[int] = Query(None, ge=3, le=10000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    start = to_naive_utc(start)
+    end = to_naive_utc(end) if end else datetime.utcnow()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    chosen, series = await query_range(db, start, end, resolution, points)
+    return RangeResult(resolution=chosen, start=start, end=end, points=series)
+
+
+ALERT_HEARTBEAT_SECONDS = 15
+
+
+@router.get("/alerts/stream")
+async def stream_alerts(request: Request, user=Depends(require_administrator),
+                        db: AsyncSession = Depends(get_async_db)):
+    """Server-sent events: one ``alert`` event per rule breach, as readings arrive."""
+    # konekcija iz provjere korisnika ne smije ostati zauzeta dok je stream otvoren
+    await db.close()
+
+    async def events():
+        with alert_broadcaster.subscribe() as queue:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=ALERT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: alert\ndata: {event.json()}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/alerts/rules", response_model=List[AlertRuleSchema])
+async def read_alert_rules(db: AsyncSession = Depends(get_async_db), user=Depends(require_administrator)):
+    result = await db.execute(select(AlertRule).order_by(AlertRule.id))
+    return result.scalars().all()
+
+
+@router.post("/alerts/rules", response_model=AlertRuleSchema, status_code=status.HTTP_201_CREATED)
+async def create_alert_rule(rule: AlertRuleCreate, db: AsyncSession = Depends(get_async_db),
+                            user=Depends(require_administrator)):
+    db_rule = AlertRule(**rule.dict())
+    db.add(db_rule)
+    await db.commit()
+    await db.refresh(db_rule)
+    await alert_engine.load()
+    return db_rule
+
+
+@router.put("/alerts/rules/{rule_id}", response_model=AlertRuleSchema)
+async def update_alert_rule(rule_id: int, rule: AlertRuleUpdate, db: AsyncSession = Depends(get_async_db),
+                            user=Depends(require_administrator)):
+    db_rule = await db.get(AlertRule, rule_id)
+    if not db_rule:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    for field, value in rule.dict().items():
+        setattr(db_rule, field, value)
+    await db.commit()
+    await db.refresh(db_rule)
+    await alert_engine.load()
+    return db_rule
+
+
+@router.delete("/alerts/rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_alert_rule(rule_id: int, db: AsyncSession = Depends(get_async_db),
+                            user=Depends(require_administrator)):
+    db_rule = await db.get(AlertRule, rule_id)
+    if not db_rule:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    await db.delete(db_rule)
+    await db.commit()
+    await alert_engine.load()
+
+
+@router.get("/export")
+async def export_logs(format: ExportFormat = ExportFormat.csv):
+    async def batches():
+        async for batch in all_readings():
+            yield [(row_id, temperature, humidity, recorded_at, device_id)
+                   for row_id, recorded_at, temperature, humidity, device_id in batch]
+
+    return export_batches_response(
+        ["id", "temperature", "humidity", "recorded_at", "device_id"], batches(), format, "temperature_humidity"
+    )
+
+MAX_LOG_LIMIT = 5000
+
+
+def _reading(row) -> dict:
+    row_id, recorded_at, temperature, humidity, device_id = row
+    return {"id": row_id, "recorded_at": recorded_at, "temperature": temperature,
+            "humidity": humidity, "device_id": device_id}
+
+
+@router.get(
+    "/",
+    response_model=list[TemperatureHumidity],
+    dependencies=[Depends(conditional_get(TemperatureHumidityLog.__tablename__))],
+)
+async def read_logs(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=MAX_LOG_LIMIT),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Newest readings first, at most ``limit``, archived months included.
 
+    Older readings are read by moving ``end`` back; ``/export`` returns everything.
+    """
+    start = to_naive_utc(start) if start else None
+    end = to_naive_utc(end) if end else None
+    return [_reading(row) for row in await latest_readings(db, start, end, limit)]
 
 
 @router.get("/{log_id}", response_model=TemperatureHumidity)
 async def read_log(log_id: int, db: AsyncSession = Depends(get_async_db)):
     result = await db.execute(select(TemperatureHumidityLog).filter(TemperatureHumidityLog.id == log_id))
     log = result.scalars().first()
-    if not log:
+    if log:
+        return log
+    # ocitanje je mozda premjesteno u arhivu (arhivirana su samo za citanje)
+    archived = await run_in_threadpool(find_archived, log_id)
+    if archived is None:
         raise HTTPException(status_code=404, detail="Log not found")
-    return log
+    return _reading(archived)
 
 @router.post("/", response_model=TemperatureHumidity)
-async def create_log(log: TemperatureHumidityCreate, db: AsyncSession = Depends(get_async_db)):
+async def create_log(log: TemperatureHumidityCreate, background_tasks: BackgroundTasks,
+                     db: AsyncSession = Depends(get_async_db)):
     db_log = TemperatureHumidityLog(
         temperature=log.temperature,
         humidity=log.humidity,
         recorded_at=datetime.utcnow()
     )
     db.add(db_log)
+    await apply_rollups(db, [{
+        "recorded_at": db_log.recorded_at,
+        "temperature": db_log.temperature,
+        "humidity": db_log.humidity,
+    }])
+    await bump_version(db, TemperatureHumidityLog.__tablename__)
     await db.commit()
     await db.refresh(db_log)
+    events = await check_readings([{
+        "recorded_at": db_log.recorded_at,
+        "temperature": db_log.temperature,
+        "humidity": db_log.humidity,
+    }])
+    if events:
+        background_tasks.add_task(store_alert_notifications, events)
     return db_log
 
 @router.put("/{log_id}", response_model=TemperatureHumidity)
@@ -71,6 +286,9 @@ async def update_log(log_id: int, log: TemperatureHumidityUpdate, db: AsyncSessi
     
     db_log.temperature = log.temperature
     db_log.humidity = log.humidity
+    await db.flush()
+    await rebuild_rollups_around(db, db_log.recorded_at)
+    await bump_version(db, TemperatureHumidityLog.__tablename__)
     await db.commit()
     await db.refresh(db_log)
     return db_log
@@ -83,6 +301,9 @@ async def delete_log(log_id: int, db: AsyncSession = Depends(get_async_db)):
         raise HTTPException(status_code=404, detail="Log not found")
     
     await db.delete(db_log)
+    await db.flush()
+    await rebuild_rollups_around(db, db_log.recorded_at)
+    await bump_version(db, TemperatureHumidityLog.__tablename__)
     await db.commit()
     return db_log
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import date, datetime
 from enum import Enum
 
@@ -31,4 +31,99 @@ class MedicineOut(MedicineBase):
     image_path: Optional[str]
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class MedicineSortKey(str, Enum):
+    id = "id"
+    name = "name"
+    quantity = "quantity"
+    expiration_date = "expiration_date"
+    price = "price"
+
+
+class SortOrder(str, Enum):
+    asc = "asc"
+    desc = "desc"
+
+
+class MedicineListItem(BaseModel):
+    id: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    manufacturer: Optional[str] = None
+    dosage_form: Optional[str] = None
+    strength: Optional[str] = None
+    quantity: Optional[int] = None
+    expiration_date: Optional[date] = None
+    type_id: Optional[int] = None
+    supplier_id: Optional[int] = None
+    price: Optional[float] = None
+    image_path: Optional[str] = None
+
+
+class MedicinePage(BaseModel):
+    items: List[MedicineListItem]
+    next_cursor: Optional[str] = None
+
+
+class SearchMode(str, Enum):
+    prefix = "prefix"
+    fuzzy = "fuzzy"
+    trigram = "trigram"
+
+
+class MedicineSearchHit(BaseModel):
+    id: int
+    name: str
+    manufacturer: Optional[str] = None
+    strength: Optional[str] = None
+    score: float
+    # ostala polja za prikaz u galeriji, ucitana iz baze za pogotke
+    dosage_form: Optional[str] = None
+    quantity: Optional[int] = None
+    expiration_date: Optional[date] = None
+    price: Optional[float] = None
+    image_path: Optional[str] = None
+
+
+class MedicineImportRow(MedicineCreate):
+    id: Optional[int] = None
+    description: Optional[str] = None
+    manufacturer: Optional[str] = None
+    supplier_id: Optional[int] = None
+
+
+class MedicineImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class MedicineImportResult(BaseModel):
+    inserted: int
+    updated: int
+    errors: List[MedicineImportError]
+
+
+class ExpiryBucket(BaseModel):
+    bucket: str
+    count: int
+    stock_value: float
+
+
+class ExpirySummary(BaseModel):
+    as_of: date
+    buckets: List[ExpiryBucket]
+
+
+class StockLevel(BaseModel):
+    medicine_id: int
+    at: datetime
+    quantity: int
+
+
+class StockMovement(BaseModel):
+    medicine_id: int
+    start: datetime
+    end: datetime
+    net_change: int
+    by_reason: Dict[str, int]
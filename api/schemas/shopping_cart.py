@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional
+from enum import Enum
+from pydantic import BaseModel, Field, root_validator
+from typing import List, Optional
 
 class ShoppingCartCreate(BaseModel):
     user_id: int
@@ -33,4 +34,40 @@ class ShoppingCartResponseWithMedicine(BaseModel):
     medicine: MedicineInfo  
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class CartOperationType(str, Enum):
+    add = "add"
+    set = "set"
+    remove = "remove"
+
+
+class CartOperation(BaseModel):
+    op: CartOperationType
+    medicine_id: int
+    # 0 ima smisla samo za set (isto kao remove)
+    quantity: int = Field(1, ge=0)
+
+    @root_validator(skip_on_failure=True)
+    def check_quantity(cls, values):
+        if values.get("op") == CartOperationType.add and values.get("quantity") == 0:
+            raise ValueError("add needs a quantity greater than 0")
+        return values
+
+
+class CartBatch(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1, max_length=500)
+
+
+class CartLine(BaseModel):
+    id: int
+    medicine_id: int
+    quantity: int
+    medicine: MedicineInfo
+    line_total: float
+
+
+class CartSummary(BaseModel):
+    items: List[CartLine]
+    total: float
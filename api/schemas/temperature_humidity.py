@@ -1,5 +1,7 @@
 from datetime import datetime
-from pydantic import BaseModel, Field
+from enum import Enum
+from typing import List, Optional
+from pydantic import BaseModel, Field, root_validator
 
 class TemperatureHumidityBase(BaseModel):
     temperature: float = Field(..., example=22.5)
@@ -14,6 +16,102 @@ class TemperatureHumidityUpdate(TemperatureHumidityBase):
 class TemperatureHumidity(TemperatureHumidityBase):
     id: int
     recorded_at: datetime
+    device_id: Optional[str] = None
 
     class Config:
         orm_mode = True
+
+
+class SensorReading(TemperatureHumidityBase):
+    device_id: str = Field(..., max_length=100)
+    recorded_at: Optional[datetime] = None
+
+
+class IngestError(BaseModel):
+    line: int
+    error: str
+
+
+class IngestResult(BaseModel):
+    accepted: int
+    rejected: int
+    errors: List[IngestError]
+
+
+class Resolution(str, Enum):
+    auto = "auto"
+    raw = "raw"
+    minute = "minute"
+    hour = "hour"
+    day = "day"
+
+
+class RangePoint(BaseModel):
+    time: datetime
+    temperature: float
+    humidity: float
+    count: int = 1
+    temperature_min: Optional[float] = None
+    temperature_max: Optional[float] = None
+    humidity_min: Optional[float] = None
+    humidity_max: Optional[float] = None
+
+
+class RangeResult(BaseModel):
+    resolution: Resolution
+    start: datetime
+    end: datetime
+    points: List[RangePoint]
+
+
+class AlertMetric(str, Enum):
+    temperature = "temperature"
+    humidity = "humidity"
+
+
+class AlertKind(str, Enum):
+    threshold = "threshold"
+    rate = "rate"
+
+
+class AlertRuleBase(BaseModel):
+    name: str = Field(..., max_length=100)
+    metric: AlertMetric
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    max_rate: Optional[float] = Field(None, gt=0, description="Largest allowed change per minute")
+    device_id: Optional[str] = Field(None, max_length=100)
+    is_active: bool = True
+
+    @root_validator(skip_on_failure=True)
+    def check_condition(cls, values):
+        if values.get("min_value") is None and values.get("max_value") is None and values.get("max_rate") is None:
+            raise ValueError("Set at least one of min_value, max_value or max_rate")
+        return values
+
+
+class AlertRuleCreate(AlertRuleBase):
+    pass
+
+
+class AlertRuleUpdate(AlertRuleBase):
+    pass
+
+
+class AlertRule(AlertRuleBase):
+    id: int
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class AlertEvent(BaseModel):
+    rule_id: int
+    rule_name: str
+    metric: AlertMetric
+    kind: AlertKind
+    value: float
+    device_id: Optional[str] = None
+    recorded_at: datetime
+    message: str
@@ -0,0 +1,137 @@
+import copy
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "1024"))
+
+
+class LocalCache:
+    """In-process TTL/LRU cache; the stand-in when no shared backend is configured.
+
+    Values are copied in and out, so callers can't mutate a cached entry.
+    """
+
+    def __init__(self, max_entries: int = LOCAL_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return copy.deepcopy(value)
+
+    async def generation(self, key: str) -> int:
+        return self._generations.get(key, 0)
+
+    async def set(self, key: str, value: Any, ttl: int, generation: Optional[int] = None):
+        if generation is not None and generation != self._generations.get(key, 0):
+            return
+        self._data[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+        self._data.move_to_end(key)
+        while len(self._data) > self._max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+
+# upis samo ako se generacija kljuca nije promijenila od pocetka ucitavanja
+_SET_IF_GENERATION = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[3] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+"""
+
+
+class RedisCache:
+    """Shared backend so every uvicorn worker sees the same entries and invalidations."""
+
+    def __init__(self, url: str):
+        from redis import asyncio as aioredis
+
+        self._client = aioredis.from_url(url)
+        self._set_if_generation = self._client.register_script(_SET_IF_GENERATION)
+
+    @staticmethod
+    def _generation_key(key: str) -> str:
+        return f"{key}:generation"
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def generation(self, key: str) -> int:
+        raw = await self._client.get(self._generation_key(key))
+        return int(raw) if raw is not None else 0
+
+    async def set(self, key: str, value: Any, ttl: int, generation: Optional[int] = None):
+        raw = json.dumps(value, default=str)
+        if generation is None:
+            await self._client.set(key, raw, ex=ttl)
+        else:
+            await self._set_if_generation(keys=[key, self._generation_key(key)], args=[raw, ttl, generation])
+
+    async def delete(self, *keys: str):
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.delete(*keys)
+            for key in keys:
+                pipe.incr(self._generation_key(key))
+            await pipe.execute()
+
+
+def _create_backend():
+    if CACHE_REDIS_URL:
+        try:
+            return RedisCache(CACHE_REDIS_URL)
+        except ImportError:
+            logger.warning("CACHE_REDIS_URL is set but the redis package is not installed, using local cache")
+    return LocalCache()
+
+
+cache = _create_backend()
+
+
+async def read_through(key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+    """Return the cached value or load and cache it.
+
+    A load that overlaps an ``invalidate`` of the same key is returned but not
+    cached, so a stale read can't outlive the write that invalidated it.
+    """
+    try:
+        value = await cache.get(key)
+        if value is not None:
+            return value
+        generation = await cache.generation(key)
+    except Exception as e:
+        logger.warning("Cache get failed for %s: %s", key, e)
+        return await loader()
+
+    value = await loader()
+    try:
+        await cache.set(key, value, ttl, generation)
+    except Exception as e:
+        logger.warning("Cache set failed for %s: %s", key, e)
+    return value
+
+
+async def invalidate(*keys: str):
+    try:
+        await cache.delete(*keys)
+    except Exception as e:
+        logger.warning("Cache invalidation failed for %s: %s", keys, e)
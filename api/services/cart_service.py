@@ -0,0 +1,106 @@
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models.medicine_models import Medicine
+from models.shopping_cart import ShoppingCart
+from schemas.shopping_cart import CartLine, CartOperation, CartOperationType, CartSummary, MedicineInfo
+
+
+def fold_operations(operations: List[CartOperation]) -> Dict[int, Tuple[str, int]]:
+    """Collapse the batch to one final action per medicine.
+
+    Actions are ``("delta", n)`` (add to whatever is in the cart),
+    ``("set", n)`` or ``("remove", 0)``, so every medicine is touched by at most
+    one statement.
+    """
+    actions: Dict[int, Tuple[str, int]] = {}
+    for operation in operations:
+        current = actions.get(operation.medicine_id)
+        if operation.op == CartOperationType.remove or (
+            operation.op == CartOperationType.set and operation.quantity == 0
+        ):
+            actions[operation.medicine_id] = ("remove", 0)
+        elif operation.op == CartOperationType.set:
+            actions[operation.medicine_id] = ("set", operation.quantity)
+        elif current is None:
+            actions[operation.medicine_id] = ("delta", operation.quantity)
+        elif current[0] == "remove":
+            actions[operation.medicine_id] = ("set", operation.quantity)
+        else:
+            actions[operation.medicine_id] = (current[0], current[1] + operation.quantity)
+    return actions
+
+
+async def upsert_cart_items(db: AsyncSession, user_id: int, quantities: Dict[int, int], replace: bool):
+    if not quantities:
+        return
+    stmt = pg_insert(ShoppingCart).values([
+        {"user_id": user_id, "medicine_id": medicine_id, "quantity": quantity}
+        for medicine_id, quantity in quantities.items()
+    ])
+    new_quantity = stmt.excluded.quantity if replace else ShoppingCart.quantity + stmt.excluded.quantity
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ShoppingCart.user_id, ShoppingCart.medicine_id],
+        set_={"quantity": new_quantity},
+    )
+    await db.execute(stmt)
+
+
+async def apply_cart_batch(db: AsyncSession, user_id: int, operations: List[CartOperation]):
+    actions = fold_operations(operations)
+
+    upserted = [medicine_id for medicine_id, (action, _) in actions.items() if action != "remove"]
+    if upserted:
+        result = await db.execute(select(Medicine.id).where(Medicine.id.in_(upserted)))
+        unknown = set(upserted) - set(result.scalars().all())
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Medicine not found: {', '.join(map(str, sorted(unknown)))}")
+
+    removed = [medicine_id for medicine_id, (action, _) in actions.items() if action == "remove"]
+    if removed:
+        await db.execute(
+            delete(ShoppingCart).where(ShoppingCart.user_id == user_id, ShoppingCart.medicine_id.in_(removed))
+        )
+    await upsert_cart_items(
+        db, user_id, {m: q for m, (action, q) in actions.items() if action == "set"}, replace=True
+    )
+    await upsert_cart_items(
+        db, user_id, {m: q for m, (action, q) in actions.items() if action == "delta"}, replace=False
+    )
+    await db.commit()
+
+
+async def get_cart_summary(db: AsyncSession, user_id: int) -> CartSummary:
+    line_total = ShoppingCart.quantity * func.coalesce(Medicine.price, 0)
+    result = await db.execute(
+        select(
+            ShoppingCart.id,
+            ShoppingCart.medicine_id,
+            ShoppingCart.quantity,
+            Medicine.name,
+            Medicine.price,
+            Medicine.image_path,
+            line_total.label("line_total"),
+            func.sum(line_total).over().label("total"),
+        )
+        .join(Medicine, Medicine.id == ShoppingCart.medicine_id)
+        .where(ShoppingCart.user_id == user_id)
+        .order_by(ShoppingCart.added_at, ShoppingCart.id)
+    )
+    rows = result.all()
+    items = [
+        CartLine(
+            id=row.id,
+            medicine_id=row.medicine_id,
+            quantity=row.quantity,
+            medicine=MedicineInfo(id=row.medicine_id, name=row.name, price=row.price or 0, image_path=row.image_path),
+            line_total=float(row.line_total),
+        )
+        for row in rows
+    ]
+    return CartSummary(items=items, total=float(rows[0].total) if rows else 0.0)
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", "86400"))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "5000"))
+
+_PUNCTUATION = re.compile(r"[^\w\s%/.]|(?<!\d)\.|\.(?!\d)")
+_WHITESPACE = re.compile(r"\s+")
+_NUMBER_UNIT = re.compile(r"(\d)(?=[^\W\d])")
+
+
+def normalize_question(text: str) -> str:
+    """Case, width, punctuation and whitespace-insensitive form of a question.
+
+    Decimal points inside numbers are kept, so "0.5 mg" and "05 mg" stay distinct,
+    and a unit is always split from its number ("500mg" == "500 mg").
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _PUNCTUATION.sub(" ", text)
+    text = _NUMBER_UNIT.sub(r"\1 ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(question: str, model: str, params: Dict[str, Any], system_prompt: str) -> str:
+    payload = json.dumps(
+        {"q": normalize_question(question), "model": model, "params": params, "system": system_prompt},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """TTL/LRU cache of first-turn answers, with hit-rate counters."""
+
+    def __init__(self, ttl: int = CHAT_CACHE_TTL, max_entries: int = CHAT_CACHE_MAX_ENTRIES):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, response: str):
+        self._entries[key] = (time.monotonic() + self._ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Tuple
+
+from services.chat_provider import GroqChatProvider
+from services.conversation_store import Conversation, SYSTEM_PROMPT, conversation_store, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# budzet za historiju poslanu modelu (bez system prompta i novog pitanja)
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "3000"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "300"))
+# chat API dodaje nekoliko tokena po poruci (uloga, separatori)
+MESSAGE_TOKEN_OVERHEAD = 4
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between pharmacy staff and an assistant. "
+    f"Keep it under {CHAT_SUMMARY_MAX_TOKENS * 3 // 4} words. Keep medication names, doses, "
+    "quantities, decisions and open questions; drop small talk. Reply with the summary only."
+)
+
+_fold_tasks = set()
+
+
+def _summary_message(summary: str) -> Dict[str, str]:
+    return {"role": "system", "content": f"Summary of the earlier conversation: {summary}"}
+
+
+def build_messages(conversation: Conversation, role: str, content: str,
+                   budget: int = CHAT_CONTEXT_TOKENS) -> Tuple[List[Dict[str, str]], int]:
+    """System prompt, rolling summary, the newest turns that fit ``budget``, then the new message.
+
+    Returns the payload and how many of the oldest history messages were left out.
+    """
+    used = estimate_tokens(conversation.summary) if conversation.summary else 0
+    start = len(conversation.history)
+    while start > 0:
+        tokens = conversation.history[start - 1][2] + MESSAGE_TOKEN_OVERHEAD
+        if used + tokens > budget:
+            break
+        used += tokens
+        start -= 1
+
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if conversation.summary:
+        messages.append(_summary_message(conversation.summary))
+    messages.extend({"role": r, "content": c} for r, c, _ in conversation.history[start:])
+    messages.append({"role": role, "content": content})
+    return messages, start
+
+
+async def fold_overflow(provider: GroqChatProvider, conversation_id: str, conversation: Conversation):
+    """Summarize the turns that fell out of the window into ``conversation.summary``."""
+    _, overflow = build_messages(conversation, "user", "")
+    if not overflow or conversation.folding:
+        return
+    conversation.folding = True
+    try:
+        transcript = "\n".join(f"{role}: {content}" for role, content, _ in conversation.history[:overflow])
+        summary = await provider.complete(
+            [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Summary so far: {conversation.summary or '(none)'}\n\nNew turns:\n{transcript}"},
+            ],
+            temperature=0.2,
+            max_tokens=CHAT_SUMMARY_MAX_TOKENS,
+        )
+        conversation_store.fold(conversation_id, conversation, overflow, summary.strip())
+    except Exception:
+        # stari dio historije i dalje ostaje izvan prozora, pokusace se nakon sljedeceg odgovora
+        logger.exception("Folding chat history into the summary failed")
+    finally:
+        conversation.folding = False
+
+
+def schedule_fold(provider: GroqChatProvider, conversation_id: str, conversation: Conversation):
+    """Run ``fold_overflow`` after the answer was sent, so it never adds to response latency."""
+    task = asyncio.create_task(fold_overflow(provider, conversation_id, conversation))
+    _fold_tasks.add(task)
+    task.add_done_callback(_fold_tasks.discard)
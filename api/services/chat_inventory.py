@@ -0,0 +1,91 @@
+import re
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models.medicine_models import Medicine
+from services.search_index import medicine_index
+
+INTENT_PATTERNS = {
+    "stock": re.compile(r"\b(in stock|stock|do we have|have we got|available|availability|how many|units|left|quantity)\b"),
+    "price": re.compile(r"\b(price|prices|cost|costs|how much is|how much does|how much are)\b"),
+    "expiry": re.compile(r"\b(expir\w*|best before|shelf life)\b"),
+}
+# klinicka pitanja idu modelu i kad spominju zalihe
+CLINICAL_PATTERN = re.compile(
+    r"\b(dose|dosage|dosing|interact\w*|side effects?|contraindicat\w*|pregnan\w*|child\w*|kids?|"
+    r"take|taking|safe|alternative|instead|treat\w*|symptoms?|why|how does)\b"
+)
+DIRECT_MAX_WORDS = 20
+# rijeci iz pitanja koje nisu kandidati za naziv lijeka
+INTENT_WORDS = {
+    "stock", "have", "available", "availability", "many", "units", "left", "quantity", "price", "prices",
+    "cost", "costs", "much", "expire", "expires", "expiry", "expiring", "expiration", "before", "shelf",
+    "life", "does", "what", "when", "there", "still", "which", "pharmacy", "currently",
+}
+
+
+def detect_intents(text: str) -> Set[str]:
+    lowered = text.lower()
+    return {intent for intent, pattern in INTENT_PATTERNS.items() if pattern.search(lowered)}
+
+
+def _label(medicine: Medicine) -> str:
+    parts = [medicine.name, medicine.strength, medicine.dosage_form]
+    label = " ".join(p for p in parts if p)
+    return f"{label} ({medicine.manufacturer})" if medicine.manufacturer else label
+
+
+def _describe(medicine: Medicine, intents: Set[str]) -> str:
+    facts = []
+    if "stock" in intents:
+        facts.append(f"{medicine.quantity} units in stock" if medicine.quantity > 0 else "out of stock")
+    if "price" in intents:
+        facts.append(f"price {medicine.price:.2f} BAM" if medicine.price is not None else "no price set")
+    if "expiry" in intents:
+        facts.append(f"expires {medicine.expiration_date.isoformat()}" if medicine.expiration_date else "no expiry date recorded")
+    return f"{_label(medicine)}: {', '.join(facts)}."
+
+
+def _context_row(medicine: Medicine) -> str:
+    return (
+        f"- {_label(medicine)}: quantity {medicine.quantity}, "
+        f"price {f'{medicine.price:.2f} BAM' if medicine.price is not None else 'n/a'}, "
+        f"expires {medicine.expiration_date.isoformat() if medicine.expiration_date else 'n/a'}"
+    )
+
+
+async def _load(ids: List[int]) -> List[Medicine]:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Medicine).where(Medicine.id.in_(ids)))
+        by_id = {medicine.id: medicine for medicine in result.scalars().all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+async def answer_from_inventory(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """Answer stock, price and expiry questions from the ``medicine`` table.
+
+    Returns ``(answer, context)``: a finished answer, or the matching rows to
+    give the model as context, or neither. Medicines are resolved through the
+    in-memory search index, so questions that mention none cost only the
+    index's version check.
+    """
+    async with AsyncSessionLocal() as db:
+        await medicine_index.refresh(db)
+    ids = medicine_index.find_mentions(text, ignore=INTENT_WORDS)
+    if not ids:
+        return None, None
+    medicines = await _load(ids)
+    if not medicines:
+        return None, None
+
+    intents = detect_intents(text)
+    lowered = text.lower()
+    if intents and not CLINICAL_PATTERN.search(lowered) and len(lowered.split()) <= DIRECT_MAX_WORDS:
+        return "\n".join(_describe(medicine, intents) for medicine in medicines), None
+
+    context = "Current pharmacy inventory for the medicines in the question:\n" + "\n".join(
+        _context_row(medicine) for medicine in medicines
+    )
+    return None, context
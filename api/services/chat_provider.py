@@ -0,0 +1,95 @@
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from groq import AsyncGroq
+
+# "groq" ili "stub" (lokalni odgovori bez mreze, za razvoj i testiranje)
+CHAT_PROVIDER = os.getenv("CHAT_PROVIDER", "groq")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+# najduza pauza izmedju dva chunka odgovora
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "30"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+
+DEFAULT_PARAMS = {
+    "temperature": 1,
+    "max_tokens": 1024,
+    "top_p": 1,
+    "stop": None,
+}
+
+
+class GroqChatProvider:
+    """Async Groq client shared by all requests, so connections are pooled and reused."""
+
+    def __init__(self, api_key: str, model: str = GROQ_MODEL):
+        self.model = model
+        self._client = AsyncGroq(
+            api_key=api_key,
+            timeout=httpx.Timeout(GROQ_READ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT),
+            max_retries=1,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=GROQ_MAX_CONNECTIONS, max_keepalive_connections=GROQ_MAX_CONNECTIONS),
+            ),
+        )
+
+    async def stream(self, messages: List[Dict[str, str]], **params) -> AsyncIterator[str]:
+        """Yield content deltas as they arrive.
+
+        Closing the generator (e.g. when the HTTP client disconnects) closes
+        the upstream response, so the model stops generating for nobody.
+        """
+        completion = await self._client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            **{**DEFAULT_PARAMS, **params},
+        )
+        try:
+            async for chunk in completion:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await completion.close()
+
+    async def complete(self, messages: List[Dict[str, str]], **params) -> str:
+        parts = []
+        async for delta in self.stream(messages, **params):
+            parts.append(delta)
+        return "".join(parts)
+
+    async def aclose(self):
+        await self._client.close()
+
+
+class StubChatProvider:
+    """Local provider that answers instantly without calling any API."""
+
+    model = "stub"
+
+    def __init__(self, reply: str = "This is a stub answer to: {question}"):
+        self.reply = reply
+        self.calls = 0
+
+    async def stream(self, messages: List[Dict[str, str]], **params) -> AsyncIterator[str]:
+        self.calls += 1
+        for i, word in enumerate(self.reply.format(question=messages[-1]["content"]).split(" ")):
+            yield word if i == 0 else " " + word
+
+    async def complete(self, messages: List[Dict[str, str]], **params) -> str:
+        parts = []
+        async for delta in self.stream(messages, **params):
+            parts.append(delta)
+        return "".join(parts)
+
+    async def aclose(self):
+        pass
+
+
+def make_provider(api_key: Optional[str]):
+    if CHAT_PROVIDER == "stub":
+        return StubChatProvider()
+    if not api_key:
+        raise ValueError("GROQ_API_KEY environment variable is not set.")
+    return GroqChatProvider(api_key)
@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal, db_rejection
+from models.chat_models import ChatConversation, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+CHAT_SESSION_TTL = int(os.getenv("CHAT_SESSION_TTL", "1800"))
+CHAT_MEMORY_BUDGET_BYTES = int(os.getenv("CHAT_MEMORY_BUDGET_BYTES", str(32 * 1024 * 1024)))
+CHAT_FLUSH_INTERVAL = float(os.getenv("CHAT_FLUSH_INTERVAL", "0.2"))
+CHAT_FLUSH_SIZE = int(os.getenv("CHAT_FLUSH_SIZE", "500"))
+# gornja granica poruka koje cekaju upis; iznad toga chat vraca 503
+CHAT_MAX_PENDING = int(os.getenv("CHAT_MAX_PENDING", "20000"))
+# 7 parametara po razgovoru, asyncpg dozvoljava najvise 32767 po upitu
+CHAT_STATE_UPSERT_CHUNK = 4000
+# gornja granica poruka koje se ucitaju iz baze (sve nesazete poruke su obicno manje od ovoga)
+CHAT_LOAD_MAX_MESSAGES = int(os.getenv("CHAT_LOAD_MAX_MESSAGES", "200"))
+# tuple + reference u listi, priblizno
+MESSAGE_OVERHEAD_BYTES = 120
+
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant specialized in pharmaceutical management. "
+    "Always respond in English. Provide accurate information about medications, "
+    "dosages, inventory management, prescriptions, and general pharmacy best practices. "
+    "Keep answers clear, concise, and professional."
+)
+
+
+def _message_size(content: str) -> int:
+    return sys.getsizeof(content) + MESSAGE_OVERHEAD_BYTES
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+class Conversation:
+    """Chat history stored as ``(role, content, tokens)`` tuples.
+
+    Turns that no longer fit the context window are folded into ``summary``
+    (see ``services.chat_context``) and dropped from ``history``.
+    ``history[0]`` is message number ``history_start`` of the conversation.
+    """
+
+    __slots__ = ("history", "summary", "active", "size", "last_used", "folding",
+                 "message_count", "history_start")
+
+    def __init__(self):
+        self.history: List[Tuple[str, str, int]] = []
+        self.summary: str = ""
+        self.active: bool = True
+        self.size = 0
+        self.last_used = time.monotonic()
+        self.folding = False
+        self.message_count = 0
+        self.history_start = 0
+
+
+def _merge_state(old: Dict, new: Dict) -> Dict:
+    return {
+        **new,
+        "active": old["active"] and new["active"],
+        "message_count": old["message_count"] + new["message_count"],
+        "created_at": old["created_at"],
+    }
+
+
+class ChatWriteBuffer:
+    """Write-behind buffer: message inserts and conversation updates, flushed in batches.
+
+    Messages are only ever inserted. Conversation rows get one upsert per
+    flush with the message count delta and the latest summary; the new
+    message count it returns is what numbers the flushed messages (``seq``),
+    so workers writing to the same conversation never reuse a number.
+    A batch the database rejects with the same error twice in a row is
+    dropped (and logged), like in ``ReadingBuffer``; connection errors are
+    always retried.
+    """
+
+    def __init__(self, flush_size: int = CHAT_FLUSH_SIZE, flush_interval: float = CHAT_FLUSH_INTERVAL,
+                 max_pending: int = CHAT_MAX_PENDING):
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._messages: List[Dict] = []
+        self._states: Dict[str, Dict] = {}
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._last_error = None
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._messages) + len(self._states)
+
+    @property
+    def full(self) -> bool:
+        return len(self._messages) >= self._max_pending
+
+    def add_state(self, state: Dict):
+        previous = self._states.get(state["id"])
+        self._states[state["id"]] = _merge_state(previous, state) if previous else state
+
+    def add_message(self, message: Dict):
+        self._messages.append(message)
+        if len(self._messages) >= self._flush_size:
+            self._wake.set()
+
+    async def _upsert_states(self, db, states: List[Dict]) -> Dict[str, int]:
+        counts = {}
+        for i in range(0, len(states), CHAT_STATE_UPSERT_CHUNK):
+            stmt = pg_insert(ChatConversation).values(states[i:i + CHAT_STATE_UPSERT_CHUNK])
+            c, excluded = ChatConversation, stmt.excluded
+            newer_summary = excluded.summarized_upto > c.summarized_upto
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[c.id],
+                set_={
+                    "active": c.active & excluded.active,
+                    "message_count": c.message_count + excluded.message_count,
+                    "last_active_at": func.greatest(c.last_active_at, excluded.last_active_at),
+                    "summary": case((newer_summary, excluded.summary), else_=c.summary),
+                    "summarized_upto": func.greatest(c.summarized_upto, excluded.summarized_upto),
+                },
+            ).returning(c.id, c.message_count)
+            counts.update((await db.execute(stmt)).all())
+        return counts
+
+    async def flush(self) -> int:
+        async with self._lock:
+            messages, self._messages = self._messages, []
+            states, self._states = self._states, {}
+            if not messages and not states:
+                return 0
+            try:
+                async with AsyncSessionLocal() as db:
+                    if states:
+                        counts = await self._upsert_states(db, sorted(states.values(), key=lambda s: s["id"]))
+                    if messages:
+                        # brojevi [message_count - delta, message_count) pripadaju ovom flushu
+                        next_seq = {cid: counts[cid] - state["message_count"] for cid, state in states.items()}
+                        rows = []
+                        for message in messages:
+                            rows.append({**message, "seq": next_seq[message["conversation_id"]]})
+                            next_seq[message["conversation_id"]] += 1
+                        await db.execute(insert(ChatMessage), rows)
+                    await db.commit()
+            except BaseException as e:
+                error = db_rejection(e)
+                if error is not None and error == self._last_error:
+                    self._last_error = None
+                    self.dropped += len(messages)
+                    logger.error("Dropping %d chat messages and %d conversation updates rejected twice "
+                                 "by the database: %s", len(messages), len(states), error[1])
+                    return 0
+                self._last_error = error
+                # vracamo sve u buffer, pokusace se u sljedecem flushu
+                self._messages[:0] = messages
+                for state in states.values():
+                    current = self._states.get(state["id"])
+                    self._states[state["id"]] = _merge_state(state, current) if current else state
+                raise
+            self._last_error = None
+            return len(messages)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Chat write flush failed, %d writes pending", len(self))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+class ConversationStore:
+    """Conversations persisted through ``ChatWriteBuffer``, with a per-worker LRU cache.
+
+    The cache is bounded by idle TTL and an approximate memory budget; an
+    evicted conversation is simply reloaded from the database, summary plus
+    the messages not yet folded into it. Every lookup checks the
+    conversation row, so a turn handled by another worker invalidates the
+    cached copy. Sessions idle longer than ``CHAT_SESSION_TTL`` are ended
+    (``active = False``) and stay ended.
+    """
+
+    def __init__(self, ttl: int = CHAT_SESSION_TTL, memory_budget: int = CHAT_MEMORY_BUDGET_BYTES):
+        self._ttl = ttl
+        self._memory_budget = memory_budget
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._bytes = 0
+        self.writes = ChatWriteBuffer()
+        self.expired = 0
+        self.evicted = 0
+        self.loads = 0
+
+    def __len__(self):
+        return len(self._conversations)
+
+    def _drop(self, conversation_id: str):
+        conversation = self._conversations.pop(conversation_id)
+        self._bytes -= conversation.size
+
+    def _expire(self):
+        # LRU redoslijed: istekle sesije su uvijek na pocetku
+        deadline = time.monotonic() - self._ttl
+        while self._conversations:
+            conversation_id, conversation = next(iter(self._conversations.items()))
+            if conversation.last_used >= deadline:
+                break
+            self._drop(conversation_id)
+            self.expired += 1
+
+    def _enforce_budget(self, keep: str):
+        while self._bytes > self._memory_budget and len(self._conversations) > 1:
+            conversation_id = next(iter(self._conversations))
+            if conversation_id == keep:
+                break
+            self._drop(conversation_id)
+            self.evicted += 1
+
+    def _cache(self, conversation_id: str, conversation: Conversation):
+        if conversation_id in self._conversations:
+            self._drop(conversation_id)
+        self._conversations[conversation_id] = conversation
+        self._bytes += conversation.size
+        self._enforce_budget(keep=conversation_id)
+
+    def _save_state(self, conversation_id: str, conversation: Conversation, new_messages: int = 0):
+        now = datetime.utcnow()
+        self.writes.add_state({
+            "id": conversation_id,
+            "active": conversation.active,
+            "summary": conversation.summary,
+            "summarized_upto": conversation.history_start,
+            "message_count": new_messages,
+            "created_at": now,
+            "last_active_at": now,
+        })
+
+    async def _load(self, db, row: ChatConversation) -> Conversation:
+        result = await db.execute(
+            select(ChatMessage.seq, ChatMessage.role, ChatMessage.content, ChatMessage.tokens)
+            .where(ChatMessage.conversation_id == row.id, ChatMessage.seq >= row.summarized_upto)
+            .order_by(ChatMessage.seq.desc(), ChatMessage.id.desc())
+            .limit(CHAT_LOAD_MAX_MESSAGES)
+        )
+        rows = list(reversed(result.all()))
+        conversation = Conversation()
+        conversation.summary = row.summary
+        conversation.active = row.active
+        conversation.message_count = row.message_count
+        conversation.history_start = rows[0].seq if rows else row.message_count
+        conversation.history = [(sys.intern(m.role), m.content, m.tokens) for m in rows]
+        conversation.size = sys.getsizeof(row.summary) + sum(_message_size(m.content) for m in rows)
+        self.loads += 1
+        return conversation
+
+    async def get_or_create(self, conversation_id: str) -> Conversation:
+        self._expire()
+        cached = self._conversations.get(conversation_id)
+        async with AsyncSessionLocal() as db:
+            row = await db.get(ChatConversation, conversation_id)
+            if row is None:
+                # nova sesija, ili jos nije flushovana iz ovog workera
+                conversation = cached or Conversation()
+            elif cached is not None and cached.message_count >= row.message_count and row.active:
+                conversation = cached
+            else:
+                conversation = await self._load(db, row)
+
+        if row is not None and conversation.active and \
+                row.last_active_at < datetime.utcnow() - timedelta(seconds=self._ttl):
+            conversation.active = False
+            self._save_state(conversation_id, conversation)
+
+        conversation.last_used = time.monotonic()
+        if conversation is cached:
+            self._conversations.move_to_end(conversation_id)
+        else:
+            self._cache(conversation_id, conversation)
+        return conversation
+
+    def append(self, conversation_id: str, conversation: Conversation, role: str, content: str):
+        tokens = estimate_tokens(content)
+        self.writes.add_message({
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "tokens": tokens,
+            "created_at": datetime.utcnow(),
+        })
+        conversation.history.append((sys.intern(role), content, tokens))
+        conversation.message_count += 1
+        conversation.last_used = time.monotonic()
+        # red razgovora mora biti u istom flushu prije poruka (FK)
+        self._save_state(conversation_id, conversation, new_messages=1)
+        self._resize(conversation_id, conversation, _message_size(content))
+
+    def fold(self, conversation_id: str, conversation: Conversation, count: int, summary: str):
+        """Replace the oldest ``count`` messages with ``summary``."""
+        dropped = conversation.history[:count]
+        del conversation.history[:count]
+        conversation.history_start += count
+        delta = sys.getsizeof(summary) - sys.getsizeof(conversation.summary)
+        delta -= sum(_message_size(content) for _, content, _ in dropped)
+        conversation.summary = summary
+        self._save_state(conversation_id, conversation)
+        self._resize(conversation_id, conversation, delta)
+
+    def _resize(self, conversation_id: str, conversation: Conversation, delta: int):
+        conversation.size += delta
+        if self._conversations.get(conversation_id) is conversation:
+            self._bytes += delta
+            self._conversations.move_to_end(conversation_id)
+            self._enforce_budget(keep=conversation_id)
+
+    def stats(self) -> Dict[str, int]:
+        self._expire()
+        return {
+            "conversations": len(self._conversations),
+            "messages": sum(len(c.history) for c in self._conversations.values()),
+            "bytes": self._bytes,
+            "memory_budget_bytes": self._memory_budget,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "loads": self.loads,
+            "pending_writes": len(self.writes),
+            "dropped_messages": self.writes.dropped,
+        }
+
+
+conversation_store = ConversationStore()
@@ -0,0 +1,91 @@
+import os
+from datetime import date, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models.medicine_models import Medicine
+from schemas.medicine import ExpiryBucket, ExpirySummary
+from services.versioning import table_version
+
+EXPIRING_SOON_DAYS = int(os.getenv("EXPIRING_SOON_DAYS", "90"))
+
+# (naziv, gornja granica u danima od danas, ekskluzivno)
+BUCKETS = (("expired", 0), ("within_30", 30), ("within_60", 60), ("within_90", 90))
+
+
+class ExpirySummaryCache:
+    """Holds the bucket summary for one calendar day and one ``medicine`` table version.
+
+    Every write path bumps the shared table version, so a summary computed by
+    any worker is dropped as soon as another worker changes a medicine;
+    otherwise the summary is recomputed once per day.
+    """
+
+    def __init__(self):
+        self._key: Optional[Tuple[date, int]] = None
+        self._summary: Optional[ExpirySummary] = None
+
+    def get(self, today: date, version: int) -> Optional[ExpirySummary]:
+        if self._key == (today, version):
+            return self._summary
+        return None
+
+    def set(self, today: date, version: int, summary: ExpirySummary):
+        self._key = (today, version)
+        self._summary = summary
+
+
+expiry_summary_cache = ExpirySummaryCache()
+
+
+def expiring_soon_query(today: date, days: int):
+    return (
+        select(Medicine)
+        .where(Medicine.expiration_date.between(today, today + timedelta(days=days)))
+        .order_by(Medicine.expiration_date, Medicine.id)
+    )
+
+
+async def compute_expiry_summary(db: AsyncSession, today: date) -> ExpirySummary:
+    bucket = case(
+        *[
+            (Medicine.expiration_date < today + timedelta(days=limit), name)
+            for name, limit in BUCKETS
+        ]
+    ).label("bucket")
+    horizon = today + timedelta(days=BUCKETS[-1][1])
+    stmt = (
+        select(
+            bucket,
+            func.count().label("count"),
+            func.coalesce(func.sum(Medicine.quantity * func.coalesce(Medicine.price, 0)), 0).label("stock_value"),
+        )
+        .where(Medicine.expiration_date < horizon)
+        .group_by(bucket)
+    )
+    rows = {row.bucket: row for row in (await db.execute(stmt)).all()}
+    return ExpirySummary(
+        as_of=today,
+        buckets=[
+            ExpiryBucket(
+                bucket=name,
+                count=rows[name].count if name in rows else 0,
+                stock_value=float(rows[name].stock_value) if name in rows else 0.0,
+            )
+            for name, _ in BUCKETS
+        ],
+    )
+
+
+async def get_expiry_summary(db: AsyncSession) -> ExpirySummary:
+    today = date.today()
+    # verzija se cita prije racunanja; izmjena u toku racunanja samo uzrokuje novo racunanje
+    version = await table_version(db, Medicine.__tablename__)
+    summary = expiry_summary_cache.get(today, version)
+    if summary is None:
+        summary = await compute_expiry_summary(db, today)
+        expiry_summary_cache.set(today, version, summary)
+    return summary
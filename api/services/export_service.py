@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from database import AsyncSessionLocal
+from schemas.export import ExportFormat
+
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv; charset=utf-8",
+    ExportFormat.ndjson: "application/x-ndjson",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def _encode_csv(rows, buffer: io.StringIO, writer) -> str:
+    writer.writerows(rows)
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return chunk
+
+
+def _encode_ndjson(rows, columns: Sequence[str]) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+async def encode_batches(columns: Sequence[str], batches: AsyncIterator[Sequence],
+                         fmt: ExportFormat) -> AsyncIterator[bytes]:
+    """Yield row batches encoded as CSV or NDJSON."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == ExportFormat.csv:
+        # header odmah, da klijent dobije prvi bajt prije prvog batcha
+        yield _encode_csv([columns], buffer, writer).encode()
+
+    async for batch in batches:
+        if fmt == ExportFormat.csv:
+            yield _encode_csv(batch, buffer, writer).encode()
+        else:
+            yield _encode_ndjson(batch, columns).encode()
+
+
+async def stream_rows(stmt, fmt: ExportFormat) -> AsyncIterator[bytes]:
+    """Yield ``stmt`` encoded as CSV or NDJSON, one server-side cursor batch at a time."""
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for chunk in encode_batches(list(result.keys()), result.partitions(EXPORT_BATCH_SIZE), fmt):
+            yield chunk
+
+
+def _attachment(body: AsyncIterator[bytes], fmt: ExportFormat, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={name}.{fmt.value}"},
+    )
+
+
+def export_response(stmt, fmt: ExportFormat, name: str) -> StreamingResponse:
+    return _attachment(stream_rows(stmt, fmt), fmt, name)
+
+
+def export_batches_response(columns: Sequence[str], batches: AsyncIterator[Sequence],
+                            fmt: ExportFormat, name: str) -> StreamingResponse:
+    return _attachment(encode_batches(columns, batches, fmt), fmt, name)
@@ -0,0 +1,112 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+
+UPLOAD_DIR = "uploaded_images"
+CHUNK_SIZE = 256 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+IMAGE_MAX_WORKERS = int(os.getenv("IMAGE_MAX_WORKERS", "2"))
+
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+
+# naziv varijante -> najveca dimenzija u pikselima
+VARIANTS = {
+    "thumb": 320,
+    "web": 1280,
+}
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_MAX_WORKERS, thread_name_prefix="image")
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+
+def variant_path(image_path: str, variant: str) -> str:
+    base, _ = os.path.splitext(image_path)
+    return f"{base}_{variant}.webp"
+
+
+def _make_variants(path: str):
+    try:
+        with Image.open(path) as original:
+            original.load()
+            image = ImageOps.exif_transpose(original)
+    except (UnidentifiedImageError, OSError):
+        raise ValueError("Uploaded file is not a valid image")
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    for variant, max_size in VARIANTS.items():
+        target = variant_path(path, variant)
+        if os.path.exists(target):
+            continue
+        resized = image.copy()
+        resized.thumbnail((max_size, max_size), Image.LANCZOS)
+        tmp = f"{target}.tmp"
+        resized.save(tmp, "WEBP", quality=80, method=4)
+        os.replace(tmp, target)
+
+
+def _open_temp():
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
+    return os.fdopen(fd, "wb"), tmp_path
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def store_image(file: UploadFile) -> str:
+    """Stream an upload to disk and return its content-addressed path.
+
+    Identical images map to the same file, so re-uploads are stored once.
+    Variants (see ``VARIANTS``) are generated in the image worker pool.
+    """
+    extension = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image type {extension or '(none)'}")
+
+    digest = hashlib.sha256()
+    size = 0
+    out, tmp_path = await run_in_threadpool(_open_temp)
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="Image is too large")
+            digest.update(chunk)
+            await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        await run_in_threadpool(out.close)
+        await run_in_threadpool(_discard, tmp_path)
+        raise
+    await run_in_threadpool(out.close)
+
+    extension = ".jpg" if extension == ".jpeg" else extension
+    file_path = os.path.join(UPLOAD_DIR, f"{digest.hexdigest()}{extension}")
+    if os.path.exists(file_path):
+        await run_in_threadpool(_discard, tmp_path)
+    else:
+        await run_in_threadpool(os.replace, tmp_path, file_path)
+
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(_executor, _make_variants, file_path)
+    except ValueError as e:
+        await run_in_threadpool(_discard, file_path)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # isti format putanje kao ranije (relativno na API root, sa "/")
+    return file_path.replace(os.sep, "/")
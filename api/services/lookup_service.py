@@ -0,0 +1,37 @@
+import os
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models.lookup import MedicineType, Supplier
+from schemas.lookup import MedicineTypeOut, SupplierOut
+from services.cache import invalidate, read_through
+
+LOOKUP_CACHE_TTL = int(os.getenv("LOOKUP_CACHE_TTL", "300"))
+
+MEDICINE_TYPES_KEY = "lookup:medicine_types"
+SUPPLIERS_KEY = "lookup:suppliers"
+
+
+async def get_medicine_types(db: AsyncSession):
+    async def load():
+        result = await db.execute(select(MedicineType).order_by(MedicineType.id))
+        return [MedicineTypeOut.from_orm(mt).dict() for mt in result.scalars().all()]
+
+    return await read_through(MEDICINE_TYPES_KEY, load, LOOKUP_CACHE_TTL)
+
+
+async def get_suppliers(db: AsyncSession):
+    async def load():
+        result = await db.execute(select(Supplier).order_by(Supplier.id))
+        return [SupplierOut.from_orm(s).dict() for s in result.scalars().all()]
+
+    return await read_through(SUPPLIERS_KEY, load, LOOKUP_CACHE_TTL)
+
+
+async def invalidate_medicine_types():
+    await invalidate(MEDICINE_TYPES_KEY)
+
+
+async def invalidate_suppliers():
+    await invalidate(SUPPLIERS_KEY)
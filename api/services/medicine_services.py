@@ -1,11 +1,29 @@
+import base64
+import csv
+import io
+import json
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
+from sqlalchemy import update, delete, func, text, literal, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from models.medicine_models import Medicine
-from pydantic import BaseModel
+from models.lookup import MedicineType, Supplier
+from pydantic import BaseModel, ValidationError
 from datetime import date
-from schemas.medicine import MedicineCreate, MedicineUpdate
+from schemas.medicine import (
+    MedicineCreate, MedicineUpdate, MedicineListItem, MedicineSortKey, SortOrder,
+    MedicineImportRow, MedicineImportError
+)
+from schemas.export import ExportFormat
+from services.versioning import bump_version
+from services.stock_ledger import record_stock_changes, REASON_IMPORT
+
+# kolone koje klijent smije traziti kroz ?fields=
+LISTABLE_FIELDS = (
+    "id", "name", "description", "manufacturer", "dosage_form", "strength",
+    "quantity", "expiration_date", "type_id", "supplier_id", "price", "image_path",
+)
 
 async def get_medicines(db: AsyncSession) -> List[Medicine]:
     result = await db.execute(select(Medicine))
@@ -36,5 +54,296 @@ async def delete_medicine(db: AsyncSession, medicine_id: int):
     if not med:
         return None
     await db.delete(med)
+    await bump_version(db, Medicine.__tablename__)
     await db.commit()
-    return med
\ No newline at end of file
+    return med
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, last_id: int) -> str:
+    if isinstance(sort_value, date):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _cursor_value(sort_value, sort: MedicineSortKey):
+    # vrijednost iz kursora mora imati tip kolone, inace Postgres baca gresku (500)
+    if sort_value is None or sort == MedicineSortKey.id:
+        return sort_value
+    if isinstance(sort_value, bool):
+        raise InvalidCursor("Invalid cursor")
+    if sort == MedicineSortKey.name and isinstance(sort_value, str):
+        return sort_value
+    if sort == MedicineSortKey.quantity and isinstance(sort_value, int):
+        return sort_value
+    if sort == MedicineSortKey.price and isinstance(sort_value, (int, float)):
+        return float(sort_value)
+    if sort == MedicineSortKey.expiration_date and isinstance(sort_value, str):
+        return date.fromisoformat(sort_value)
+    raise InvalidCursor("Invalid cursor")
+
+
+def decode_cursor(cursor: str, sort: MedicineSortKey):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(last_id, int) or isinstance(last_id, bool):
+            raise InvalidCursor("Invalid cursor")
+        return _cursor_value(sort_value, sort), last_id
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def _keyset_order(column, descending: bool):
+    if descending:
+        return column.desc(), Medicine.id.desc()
+    return column.asc(), Medicine.id.asc()
+
+
+def _keyset_after(column, sort_value, last_id: int, descending: bool):
+    # (col, id) > (v, id) kao row-value poredjenje je range scan po (col, id) indeksu
+    key = tuple_(column, Medicine.id)
+    bound = tuple_(literal(sort_value, column.type), literal(last_id))
+    return key < bound if descending else key > bound
+
+
+async def list_medicines_page(
+    db: AsyncSession,
+    *,
+    name_prefix: Optional[str] = None,
+    type_id: Optional[int] = None,
+    supplier_id: Optional[int] = None,
+    min_quantity: Optional[int] = None,
+    max_quantity: Optional[int] = None,
+    expires_after: Optional[date] = None,
+    expires_before: Optional[date] = None,
+    sort: MedicineSortKey = MedicineSortKey.name,
+    order: SortOrder = SortOrder.asc,
+    fields: Optional[List[str]] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    """One page in ``sort`` order, NULL sort values last in both directions.
+
+    Non-NULL rows and the NULL tail are read by separate queries, each an
+    index range scan over ``(sort column, id)`` (backwards for ``desc``).
+    A cursor with a NULL sort value points into the tail.
+    """
+    sort_column = getattr(Medicine, sort.value)
+    descending = order == SortOrder.desc
+
+    selected = list(fields) if fields else list(LISTABLE_FIELDS)
+    for required in ("id", sort.value):
+        if required not in selected:
+            selected.append(required)
+    columns = [getattr(Medicine, f) for f in selected]
+
+    stmt = select(*columns)
+    if name_prefix:
+        escaped = name_prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        stmt = stmt.where(func.lower(Medicine.name).like(f"{escaped}%", escape="\\"))
+    if type_id is not None:
+        stmt = stmt.where(Medicine.type_id == type_id)
+    if supplier_id is not None:
+        stmt = stmt.where(Medicine.supplier_id == supplier_id)
+    if min_quantity is not None:
+        stmt = stmt.where(Medicine.quantity >= min_quantity)
+    if max_quantity is not None:
+        stmt = stmt.where(Medicine.quantity <= max_quantity)
+    if expires_after is not None:
+        stmt = stmt.where(Medicine.expiration_date >= expires_after)
+    if expires_before is not None:
+        stmt = stmt.where(Medicine.expiration_date <= expires_before)
+
+    sort_value, last_id = decode_cursor(cursor, sort) if cursor else (None, None)
+    id_after = None
+    if last_id is not None:
+        id_after = Medicine.id < last_id if descending else Medicine.id > last_id
+
+    rows = []
+    # jedan red viska da znamo postoji li sljedeca stranica
+    if sort_column is Medicine.id:
+        if id_after is not None:
+            stmt = stmt.where(id_after)
+        rows = (await db.execute(stmt.order_by(*_keyset_order(Medicine.id, descending)).limit(limit + 1))).mappings().all()
+    else:
+        in_tail = last_id is not None and sort_value is None
+        if not in_tail:
+            head = stmt.where(sort_column.is_not(None)) if sort_column.nullable else stmt
+            if last_id is not None:
+                head = head.where(_keyset_after(sort_column, sort_value, last_id, descending))
+            head = head.order_by(*_keyset_order(sort_column, descending)).limit(limit + 1)
+            rows = list((await db.execute(head)).mappings().all())
+        if sort_column.nullable and len(rows) <= limit:
+            tail = stmt.where(sort_column.is_(None))
+            if in_tail:
+                tail = tail.where(id_after)
+            tail = tail.order_by(*_keyset_order(Medicine.id, descending)).limit(limit + 1 - len(rows))
+            rows.extend((await db.execute(tail)).mappings().all())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort.value], last["id"])
+
+    returned = selected if not fields else [f for f in selected if f in fields or f == "id"]
+    items = [MedicineListItem(**{f: row[f] for f in returned}) for row in rows]
+    return items, next_cursor
+
+
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FIELDS = (
+    "name", "description", "manufacturer", "dosage_form", "strength", "quantity",
+    "expiration_date", "type_id", "supplier_id", "price", "image_path",
+)
+
+
+def _read_import_rows(fileobj, fmt: ExportFormat):
+    stream = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    if fmt == ExportFormat.csv:
+        for line_no, raw in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, raw
+    else:
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+                continue
+            yield line_no, raw if isinstance(raw, dict) else ValueError("Row must be a JSON object")
+
+
+def parse_medicine_import(fileobj, fmt: ExportFormat):
+    """Validate every row against the MedicineCreate based import schema.
+
+    Returns ``(rows, errors)`` where rows are ``(line_no, values)`` ready for
+    insert; ``values`` carries ``id`` only when the row should update an
+    existing medicine. When several rows share an id the last one wins and
+    the earlier ones are reported as errors.
+    """
+    rows, errors = [], []
+    for line_no, raw in _read_import_rows(fileobj, fmt):
+        if isinstance(raw, Exception):
+            errors.append(MedicineImportError(row=line_no, errors=[str(raw)]))
+            continue
+        # prazne CSV celije tretiramo kao NULL
+        data = {field: (raw.get(field) if raw.get(field) != "" else None) for field in ("id",) + IMPORT_FIELDS}
+        try:
+            values = MedicineImportRow(**data).dict()
+        except ValidationError as e:
+            errors.append(MedicineImportError(
+                row=line_no,
+                errors=[f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()],
+            ))
+            continue
+        if values["id"] is None:
+            del values["id"]
+        rows.append((line_no, values))
+    return _drop_duplicate_ids(rows, errors), errors
+
+
+def _drop_duplicate_ids(rows, errors):
+    # jedan upsert ne moze dvaput mijenjati isti red, zadnji red s istim id-em pobjedjuje
+    last_row = {}
+    for line_no, values in rows:
+        if "id" in values:
+            last_row[values["id"]] = line_no
+    kept = []
+    for line_no, values in rows:
+        if "id" in values and last_row[values["id"]] != line_no:
+            errors.append(MedicineImportError(
+                row=line_no,
+                errors=[f"id: duplicate id {values['id']}, superseded by row {last_row[values['id']]}"],
+            ))
+            continue
+        kept.append((line_no, values))
+    return kept
+
+
+async def _check_references(db: AsyncSession, rows, errors):
+    type_ids = {values["type_id"] for _, values in rows}
+    supplier_ids = {values["supplier_id"] for _, values in rows if values["supplier_id"] is not None}
+
+    known_types = set((await db.execute(select(MedicineType.id).where(MedicineType.id.in_(type_ids)))).scalars())
+    known_suppliers = set()
+    if supplier_ids:
+        known_suppliers = set((await db.execute(select(Supplier.id).where(Supplier.id.in_(supplier_ids)))).scalars())
+
+    valid = []
+    for line_no, values in rows:
+        problems = []
+        if values["type_id"] not in known_types:
+            problems.append(f"type_id: unknown medicine type {values['type_id']}")
+        if values["supplier_id"] is not None and values["supplier_id"] not in known_suppliers:
+            problems.append(f"supplier_id: unknown supplier {values['supplier_id']}")
+        if problems:
+            errors.append(MedicineImportError(row=line_no, errors=problems))
+        else:
+            valid.append(values)
+    return valid
+
+
+async def bulk_import_medicines(db: AsyncSession, rows, errors):
+    """Insert/upsert validated rows in batches inside a single transaction.
+
+    Returns ``(inserted, updated)``.
+    """
+    valid = await _check_references(db, rows, errors)
+    new_rows = [values for values in valid if "id" not in values]
+    existing_rows = [values for values in valid if "id" in values]
+
+    returning = (Medicine.id, Medicine.quantity)
+    stock_changes = []
+    inserted = updated = 0
+    try:
+        for i in range(0, len(new_rows), IMPORT_BATCH_SIZE):
+            result = await db.execute(
+                pg_insert(Medicine).values(new_rows[i:i + IMPORT_BATCH_SIZE]).returning(*returning)
+            )
+            batch = result.all()
+            inserted += len(batch)
+            stock_changes.extend((row.id, row.quantity) for row in batch)
+
+        for i in range(0, len(existing_rows), IMPORT_BATCH_SIZE):
+            batch = existing_rows[i:i + IMPORT_BATCH_SIZE]
+            previous = dict((await db.execute(
+                select(Medicine.id, Medicine.quantity)
+                .where(Medicine.id.in_([values["id"] for values in batch]))
+                .with_for_update()
+            )).all())
+            stmt = pg_insert(Medicine).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Medicine.id],
+                set_={field: stmt.excluded[field] for field in IMPORT_FIELDS},
+            ).returning(*returning, literal_column("(xmax = 0)").label("was_inserted"))
+            result = await db.execute(stmt)
+            for row in result.all():
+                if row.was_inserted:
+                    inserted += 1
+                else:
+                    updated += 1
+                stock_changes.append((row.id, row.quantity - previous.get(row.id, 0)))
+
+        await record_stock_changes(db, stock_changes, REASON_IMPORT)
+
+        if existing_rows:
+            # eksplicitni id-evi ne pomjeraju sekvencu
+            await db.execute(text(
+                "SELECT setval(pg_get_serial_sequence('medicine', 'id'), "
+                "(SELECT COALESCE(MAX(id), 1) FROM medicine))"
+            ))
+        if stock_changes:
+            await bump_version(db, Medicine.__tablename__)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return inserted, updated
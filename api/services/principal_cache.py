@@ -0,0 +1,58 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from models.user_models import User
+
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+# iz tabele, ne iz mappera: inspect() bi konfigurisao mappere prije nego sto
+# se ucitaju svi modeli (npr. relacije iz models.shopping_cart)
+_user_columns = [column.key for column in User.__table__.columns]
+
+
+class PrincipalCache:
+    """TTL/LRU cache of authenticated users keyed by the token subject.
+
+    Only column values are stored and every ``get`` returns a new, detached
+    ``User``, so concurrent requests never share an ORM instance.
+    ``get_current_user`` merges it into the request's session without a
+    query, so handlers can refresh, modify and commit it like a loaded row.
+    """
+
+    def __init__(self, ttl: int = PRINCIPAL_CACHE_TTL, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, username: str) -> Optional[User]:
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        expires_at, values = entry
+        if expires_at < time.monotonic():
+            del self._entries[username]
+            return None
+        self._entries.move_to_end(username)
+        user = User(**values)
+        # kao da je ucitan iz baze: merge(load=False) ga onda prihvata bez upita
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User):
+        values = {key: getattr(user, key) for key in _user_columns}
+        self._entries[user.username] = (time.monotonic() + self._ttl, values)
+        self._entries.move_to_end(user.username)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: Optional[str]):
+        if username:
+            self._entries.pop(username, None)
+
+
+principal_cache = PrincipalCache()
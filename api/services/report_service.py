@@ -0,0 +1,163 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import AsyncIterator, Callable, List
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models.medicine_models import Medicine
+from services.sensor_archive import all_readings
+
+REPORT_MAX_WORKERS = int(os.getenv("REPORT_MAX_WORKERS", "2"))
+CHUNK_SIZE = 64 * 1024
+
+MEDICINE_ROWS_PER_PAGE = 34
+TEMPERATURE_ROWS_PER_PAGE = 34
+
+_executor = ThreadPoolExecutor(max_workers=REPORT_MAX_WORKERS, thread_name_prefix="pdf-report")
+_slots = asyncio.Semaphore(REPORT_MAX_WORKERS)
+
+class ReportCancelled(Exception):
+    pass
+
+
+def _render(next_page, draw_page, cancelled: threading.Event) -> BytesIO:
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter, pageCompression=1)
+    page_no = 0
+    while True:
+        if cancelled.is_set():
+            raise ReportCancelled()
+        rows = next_page()
+        if rows is None:
+            break
+        page_no += 1
+        draw_page(c, rows, page_no)
+        c.showPage()
+    if page_no == 0:
+        draw_page(c, [], 1)
+        c.showPage()
+    c.save()
+    return buffer
+
+
+async def _next_or_none(pages):
+    try:
+        return await pages.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def render_pdf_chunks(pages: AsyncIterator[List], draw_page: Callable) -> AsyncIterator[bytes]:
+    """Build the PDF in memory in the report worker pool, then yield it in ``CHUNK_SIZE`` pieces.
+
+    This is a chunked response, not a streamed document. The worker pulls the
+    next row chunk from ``pages`` only when it is ready to draw it, so the
+    result set is never loaded at once. ReportLab keeps every drawn
+    (compressed) page until ``save()``, though, so memory grows with the size
+    of the report, and the first byte goes out only after the last page is
+    drawn.
+    """
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+
+    def next_page():
+        return asyncio.run_coroutine_threadsafe(_next_or_none(pages), loop).result()
+
+    async with _slots:
+        worker = loop.run_in_executor(_executor, _render, next_page, draw_page, cancelled)
+        try:
+            buffer = await asyncio.shield(worker)
+        finally:
+            # klijent prekinuo vezu -> worker staje na sljedecoj stranici
+            cancelled.set()
+            await asyncio.wait([worker])
+            worker.exception()
+            await pages.aclose()
+
+    # dijelovi se kopiraju jedan po jedan, ne cijeli dokument odjednom
+    with buffer.getbuffer() as pdf:
+        for i in range(0, len(pdf), CHUNK_SIZE):
+            yield bytes(pdf[i:i + CHUNK_SIZE])
+
+
+async def _medicine_pages():
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(
+                Medicine.name,
+                Medicine.dosage_form,
+                Medicine.strength,
+                Medicine.quantity,
+                Medicine.expiration_date,
+            )
+            .order_by(Medicine.name, Medicine.id)
+            .execution_options(yield_per=MEDICINE_ROWS_PER_PAGE)
+        )
+        async for partition in result.partitions(MEDICINE_ROWS_PER_PAGE):
+            yield partition
+
+
+_medicine_table_style = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('ALIGN', (3, 1), (-1, -1), 'CENTER')
+])
+
+
+def _draw_medicine_page(c, rows, page_no):
+    width, height = letter
+    data = [["Name", "Form", "Strength", "Quantity", "Expiration Date"]]
+    for name, dosage_form, strength, quantity, expiration_date in rows:
+        data.append([
+            name,
+            dosage_form or "-",
+            strength or "-",
+            quantity,
+            expiration_date.strftime("%Y-%m-%d") if expiration_date else "-"
+        ])
+
+    table = Table(data, colWidths=[120, 80, 80, 60, 100])
+    table.setStyle(_medicine_table_style)
+    _, table_height = table.wrapOn(c, width - 144, height - 144)
+    table.drawOn(c, (width - 440) / 2, height - 72 - table_height)
+
+    c.setFont("Helvetica", 9)
+    c.drawRightString(width - 72, 36, f"Page {page_no}")
+
+
+def medicine_pdf_chunks() -> AsyncIterator[bytes]:
+    return render_pdf_chunks(_medicine_pages(), _draw_medicine_page)
+
+
+async def _temperature_pages():
+    # najnovija prvo, zajedno sa arhiviranim mjesecima
+    async for batch in all_readings(reverse=True, batch_size=TEMPERATURE_ROWS_PER_PAGE):
+        yield [(row_id, temperature, humidity, recorded_at)
+               for row_id, recorded_at, temperature, humidity, _ in batch]
+
+
+def _draw_temperature_page(c, rows, page_no):
+    y = 750
+    if page_no == 1:
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(200, 750, "Temperature & Humidity Logs")
+        y = 720
+
+    c.setFont("Helvetica", 12)
+    for log_id, temperature, humidity, recorded_at in rows:
+        c.drawString(50, y, f"{log_id} | Temp: {temperature}°C | Humidity: {humidity}% | {recorded_at}")
+        y -= 20
+
+
+def temperature_pdf_chunks() -> AsyncIterator[bytes]:
+    return render_pdf_chunks(_temperature_pages(), _draw_temperature_page)
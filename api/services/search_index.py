@@ -0,0 +1,245 @@
+import asyncio
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from models.medicine_models import Medicine
+from services.versioning import table_version
+
+SEARCH_FIELDS = ("name", "manufacturer", "strength")
+TRIGRAM_THRESHOLD = 0.3
+FUZZY_CANDIDATE_THRESHOLD = 0.1
+MENTION_CANDIDATE_THRESHOLD = 0.5
+MENTION_MIN_TOKEN_LENGTH = 4
+
+_token_re = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: Optional[str]) -> str:
+    if not text:
+        return ""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.lower()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _token_re.findall(normalize(text))
+
+
+def trigrams(token: str) -> Set[str]:
+    # isto kao pg_trgm: dva razmaka ispred, jedan iza
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def _build(rows) -> Tuple[Dict, Dict, Dict, List[Tuple[str, int]], Dict[str, Set[int]]]:
+    docs, doc_tokens, doc_trigrams = {}, {}, {}
+    terms = []
+    postings: Dict[str, Set[int]] = defaultdict(set)
+    for medicine_id, name, manufacturer, strength in rows:
+        doc = {"name": name, "manufacturer": manufacturer, "strength": strength}
+        tokens = set()
+        for field in SEARCH_FIELDS:
+            tokens.update(tokenize(doc[field]))
+        grams = set()
+        for token in tokens:
+            grams |= trigrams(token)
+            terms.append((token, medicine_id))
+        for gram in grams:
+            postings[gram].add(medicine_id)
+        docs[medicine_id] = doc
+        doc_tokens[medicine_id] = tokens
+        doc_trigrams[medicine_id] = grams
+    # jedno sortiranje za sve (token, id) parove umjesto insort po tokenu
+    terms.sort()
+    return docs, doc_tokens, doc_trigrams, terms, postings
+
+
+class MedicineSearchIndex:
+    """Prefix / trigram / fuzzy index over medicine name, manufacturer and strength.
+
+    Every worker holds its own copy. ``refresh`` compares it with the shared
+    ``medicine`` table_version and rebuilds it when any worker has written
+    medicines since, so searches see other workers' writes without reading
+    the medicine table on every request.
+    """
+
+    def __init__(self):
+        self._docs: Dict[int, Dict[str, Optional[str]]] = {}
+        self._doc_tokens: Dict[int, Set[str]] = {}
+        self._doc_trigrams: Dict[int, Set[str]] = {}
+        # sortirana lista (token, id) za prefiks pretragu preko bisect
+        self._terms: List[Tuple[str, int]] = []
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self.version: Optional[int] = None
+        self._rebuild_lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    async def rebuild(self, db: AsyncSession):
+        async with self._rebuild_lock:
+            await self._rebuild(db, await table_version(db, Medicine.__tablename__))
+
+    async def refresh(self, db: AsyncSession):
+        version = await table_version(db, Medicine.__tablename__)
+        if self.version is not None and version <= self.version:
+            return
+        async with self._rebuild_lock:
+            # drugi zahtjev je mozda vec obnovio indeks dok smo cekali
+            if self.version is None or version > self.version:
+                await self._rebuild(db, version)
+
+    async def _rebuild(self, db: AsyncSession, version: int):
+        # verzija je procitana prije redova; upis izmedju samo uzrokuje jos jedno obnavljanje
+        result = await db.execute(
+            select(Medicine.id, Medicine.name, Medicine.manufacturer, Medicine.strength)
+        )
+        rows = result.all()
+        # gradi se u threadpoolu pa zamjenjuje odjednom; pretrage do tada koriste stari indeks
+        built = await run_in_threadpool(_build, rows)
+        self._docs, self._doc_tokens, self._doc_trigrams, self._terms, self._postings = built
+        self.version = version
+
+    def _prefix_ids(self, prefix: str) -> Set[int]:
+        ids = set()
+        i = bisect.bisect_left(self._terms, (prefix, -1))
+        while i < len(self._terms) and self._terms[i][0].startswith(prefix):
+            ids.add(self._terms[i][1])
+            i += 1
+        return ids
+
+    def _trigram_scores(self, query_tokens: List[str], threshold: float) -> Dict[int, float]:
+        query_grams = set()
+        for token in query_tokens:
+            query_grams |= trigrams(token)
+        if not query_grams:
+            return {}
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in query_grams:
+            for medicine_id in self._postings.get(gram, ()):
+                shared[medicine_id] += 1
+        scores = {}
+        for medicine_id, count in shared.items():
+            # udio trigrama upita prisutnih u dokumentu (kao word_similarity u pg_trgm)
+            score = count / len(query_grams)
+            if score >= threshold:
+                scores[medicine_id] = score
+        return scores
+
+    def search_prefix(self, query: str) -> Dict[int, float]:
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return {}
+        ids = None
+        for token in query_tokens:
+            matched = self._prefix_ids(token)
+            ids = matched if ids is None else ids & matched
+            if not ids:
+                return {}
+        scores = {}
+        for medicine_id in ids:
+            name = normalize(self._docs[medicine_id]["name"])
+            # pogodak na pocetku imena ide prvi, krace ime prije duzeg
+            scores[medicine_id] = (2.0 if name.startswith(query_tokens[0]) else 1.0) - len(name) / 1000
+        return scores
+
+    def search_trigram(self, query: str) -> Dict[int, float]:
+        return self._trigram_scores(tokenize(query), TRIGRAM_THRESHOLD)
+
+    def search_fuzzy(self, query: str) -> Dict[int, float]:
+        query_tokens = tokenize(query)
+        scores = {}
+        for medicine_id, similarity in self._trigram_scores(query_tokens, FUZZY_CANDIDATE_THRESHOLD).items():
+            doc_tokens = self._doc_tokens[medicine_id]
+            total = 0
+            for token in query_tokens:
+                max_distance = max(1, len(token) // 4)
+                best = min(
+                    (edit_distance(token, candidate[:len(token) + max_distance], max_distance) for candidate in doc_tokens),
+                    default=max_distance + 1,
+                )
+                if best > max_distance:
+                    break
+                total += best
+            else:
+                scores[medicine_id] = similarity - total * 0.1 + 1.0
+        return scores
+
+    def find_mentions(self, text: str, ignore: Set[str] = frozenset(), limit: int = 3) -> List[int]:
+        """Ids of medicines whose name appears (typos allowed) in free text.
+
+        Ranked by the share of name tokens found, then by whether the
+        medicine's strength is mentioned too ("amoxicillin 500mg").
+        """
+        text_tokens = set(tokenize(text))
+        words = [t for t in text_tokens if len(t) >= MENTION_MIN_TOKEN_LENGTH and not t.isdigit() and t not in ignore]
+        candidates: Set[int] = set()
+        for word in words:
+            candidates.update(self._trigram_scores([word], MENTION_CANDIDATE_THRESHOLD))
+
+        scores = {}
+        for medicine_id in candidates:
+            doc = self._docs[medicine_id]
+            name_tokens = tokenize(doc["name"])
+            hits = sum(
+                1 for name_token in name_tokens
+                if any(edit_distance(word, name_token, max(1, len(name_token) // 4)) <= max(1, len(name_token) // 4)
+                       for word in words)
+            )
+            if not hits:
+                continue
+            strength_tokens = set(tokenize(doc["strength"]))
+            score = hits / len(name_tokens)
+            if strength_tokens and strength_tokens <= text_tokens:
+                score += 0.5
+            scores[medicine_id] = score
+        if not scores:
+            return []
+        top = max(scores.values())
+        # samo najbolji pogoci; "amoxicillin" ne vraca i "amoxicillin clavulanic" ako ima tacniji
+        best = sorted((item for item in scores.items() if item[1] == top), key=lambda item: item[0])
+        return [medicine_id for medicine_id, _ in best[:limit]]
+
+    def search(self, query: str, mode: str = "prefix", limit: int = 10) -> List[Dict]:
+        if mode == "trigram":
+            scores = self.search_trigram(query)
+        elif mode == "fuzzy":
+            scores = self.search_fuzzy(query)
+        else:
+            scores = self.search_prefix(query)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [
+            {"id": medicine_id, **self._docs[medicine_id], "score": round(score, 4)}
+            for medicine_id, score in best
+        ]
+
+
+medicine_index = MedicineSearchIndex()
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models.temperature_humidity import AlertRule
+from models.user_models import Notification, RoleEnum, User
+from schemas.temperature_humidity import AlertEvent, AlertKind
+
+logger = logging.getLogger(__name__)
+
+# koliko cesto worker ponovo ucitava pravila (izmjene iz drugih workera)
+ALERT_RULES_TTL = float(os.getenv("ALERT_RULES_TTL", "30"))
+ALERT_SUBSCRIBER_QUEUE = 100
+NOTIFICATION_MESSAGE_LENGTH = 250
+
+
+class AlertEngine:
+    """Evaluates alert rules incrementally against incoming readings.
+
+    Per (rule, device) it keeps only the previous reading and whether the rule
+    is currently breached, so each reading is checked in constant time and an
+    alert fires once when a rule enters breach, not on every reading.
+    """
+
+    def __init__(self):
+        self._rules: List[AlertRule] = []
+        self._loaded_at: Optional[float] = None
+        self._last: Dict[Tuple[int, Optional[str]], Tuple[datetime, float]] = {}
+        self._breached: Set[Tuple[int, Optional[str], AlertKind]] = set()
+
+    async def load(self):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(AlertRule).where(AlertRule.is_active.is_(True)))
+            rules = result.scalars().all()
+        self._rules = rules
+        self._loaded_at = time.monotonic()
+        rule_ids = {rule.id for rule in rules}
+        self._last = {key: value for key, value in self._last.items() if key[0] in rule_ids}
+        self._breached = {key for key in self._breached if key[0] in rule_ids}
+
+    async def ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > ALERT_RULES_TTL:
+            await self.load()
+
+    def _check(self, rule: AlertRule, kind: AlertKind, device_id: Optional[str], breached: bool) -> bool:
+        """Track breach state; True only on the transition into breach."""
+        key = (rule.id, device_id, kind)
+        if not breached:
+            self._breached.discard(key)
+            return False
+        if key in self._breached:
+            return False
+        self._breached.add(key)
+        return True
+
+    def evaluate(self, rows: Sequence[Dict]) -> List[AlertEvent]:
+        events = []
+        if not self._rules:
+            return events
+        for row in sorted(rows, key=lambda row: row["recorded_at"]):
+            device_id = row.get("device_id")
+            for rule in self._rules:
+                if rule.device_id is not None and rule.device_id != device_id:
+                    continue
+                value = row[rule.metric]
+                recorded_at = row["recorded_at"]
+
+                out_of_range = (
+                    (rule.min_value is not None and value < rule.min_value)
+                    or (rule.max_value is not None and value > rule.max_value)
+                )
+                if (rule.min_value is not None or rule.max_value is not None) and \
+                        self._check(rule, AlertKind.threshold, device_id, out_of_range):
+                    events.append(_event(
+                        rule, AlertKind.threshold, value, device_id, recorded_at,
+                        f"{rule.metric} {value:g} outside [{_bound(rule.min_value)}, {_bound(rule.max_value)}]",
+                    ))
+
+                if rule.max_rate is None:
+                    continue
+                key = (rule.id, device_id)
+                previous = self._last.get(key)
+                if previous is not None and recorded_at <= previous[0]:
+                    # zakasnjelo ocitanje ne mijenja stanje brzine promjene
+                    continue
+                self._last[key] = (recorded_at, value)
+                if previous is None:
+                    continue
+                minutes = (recorded_at - previous[0]).total_seconds() / 60
+                rate = (value - previous[1]) / minutes
+                if self._check(rule, AlertKind.rate, device_id, abs(rate) > rule.max_rate):
+                    events.append(_event(
+                        rule, AlertKind.rate, value, device_id, recorded_at,
+                        f"{rule.metric} changing {rate:+.2f}/min (limit {rule.max_rate:g}/min)",
+                    ))
+        return events
+
+
+def _bound(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:g}"
+
+
+def _event(rule: AlertRule, kind: AlertKind, value: float, device_id: Optional[str],
+           recorded_at: datetime, detail: str) -> AlertEvent:
+    where = f" on {device_id}" if device_id else ""
+    return AlertEvent(
+        rule_id=rule.id,
+        rule_name=rule.name,
+        metric=rule.metric,
+        kind=kind,
+        value=value,
+        device_id=device_id,
+        recorded_at=recorded_at,
+        message=f"{rule.name}{where}: {detail}",
+    )
+
+
+class AlertBroadcaster:
+    """In-process fan-out of alert events to connected SSE clients."""
+
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    @contextmanager
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=ALERT_SUBSCRIBER_QUEUE)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    def publish(self, events: Sequence[AlertEvent]):
+        for queue in self._subscribers:
+            for event in events:
+                if queue.full():
+                    # spor klijent gubi najstariji alarm, ingest se nikad ne blokira
+                    queue.get_nowait()
+                queue.put_nowait(event)
+
+
+alert_engine = AlertEngine()
+alert_broadcaster = AlertBroadcaster()
+
+
+async def store_alert_notifications(events: Sequence[AlertEvent]):
+    """Create one Notification per administrator and event."""
+    async with AsyncSessionLocal() as db:
+        admin_ids = (await db.execute(
+            select(User.id).where(User.role == RoleEnum.administrator, User.is_active.is_(True))
+        )).scalars().all()
+        rows = [
+            {
+                "user_id": user_id,
+                "message": event.message[:NOTIFICATION_MESSAGE_LENGTH],
+                "created_at": datetime.utcnow(),
+                "is_read": False,
+            }
+            for event in events
+            for user_id in admin_ids
+        ]
+        if rows:
+            await db.execute(insert(Notification), rows)
+            await db.commit()
+
+
+async def check_readings(rows: Sequence[Dict]) -> List[AlertEvent]:
+    """Evaluate freshly accepted readings and push any breaches to subscribers."""
+    await alert_engine.ensure_loaded()
+    events = alert_engine.evaluate(rows)
+    if events:
+        alert_broadcaster.publish(events)
+        logger.info("Sensor alerts: %d rule breaches", len(events))
+    return events
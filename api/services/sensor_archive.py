@@ -0,0 +1,392 @@
+import array
+import asyncio
+import bisect
+import heapq
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import AsyncIterator, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from starlette.concurrency import run_in_threadpool
+
+from database import AsyncSessionLocal, engine
+from models.temperature_humidity import TemperatureHumidityLog
+from services.versioning import bump_version
+
+logger = logging.getLogger(__name__)
+
+SENSOR_ARCHIVE_DIR = os.getenv("SENSOR_ARCHIVE_DIR", "sensor_archive")
+# ocitanja starija od ovoga (zaokruzeno na cijele mjesece) idu u arhivu
+SENSOR_HOT_RETENTION_DAYS = int(os.getenv("SENSOR_HOT_RETENTION_DAYS", "90"))
+# 0 = arhiva se nikad ne brise
+SENSOR_ARCHIVE_RETENTION_MONTHS = int(os.getenv("SENSOR_ARCHIVE_RETENTION_MONTHS", "0"))
+SENSOR_ARCHIVE_INTERVAL = int(os.getenv("SENSOR_ARCHIVE_INTERVAL", "86400"))
+ARCHIVE_BATCH_SIZE = 10000
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# naziv kolone -> array typecode; temperatura/vlaznost kao float32 (dovoljno za senzore)
+COLUMNS = (
+    ("id", "q"),
+    ("recorded_at", "q"),
+    ("temperature", "f"),
+    ("humidity", "f"),
+    ("device", "i"),
+)
+
+
+def _to_micros(ts: datetime) -> int:
+    return (ts - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(value: int) -> datetime:
+    return _EPOCH + value * _MICROSECOND
+
+
+def _from_float32(value: float) -> float:
+    # float32 -> najkraci decimalni zapis (21.3 umjesto 21.299999237060547)
+    return float(f"{value:.7g}")
+
+
+def _month_start(ts: datetime) -> datetime:
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(ts: datetime) -> datetime:
+    return (ts.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+class ArchiveSegment:
+    """One archived part: a column file per field, memory-mapped on first read."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.start = datetime.fromisoformat(meta["start"])
+        self.end = datetime.fromisoformat(meta["end"])
+        self.devices = meta["devices"]
+        self._columns = None
+        self._maps = []
+
+    def _load(self):
+        if self._columns is None:
+            columns = {}
+            for name, typecode in COLUMNS:
+                with open(os.path.join(self.path, f"{name}.bin"), "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(mapped)
+                columns[name] = memoryview(mapped).cast(typecode)
+            self._columns = columns
+        return self._columns
+
+    def rows(self, start: datetime, end: datetime,
+             reverse: bool = False) -> Iterator[Tuple[int, datetime, float, float, Optional[str]]]:
+        columns = self._load()
+        recorded_at = columns["recorded_at"]
+        lo = bisect.bisect_left(recorded_at, _to_micros(start))
+        hi = bisect.bisect_right(recorded_at, _to_micros(end))
+        for i in (range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)):
+            yield self._row(columns, i)
+
+    def find(self, row_id: int) -> Optional[Tuple[int, datetime, float, float, Optional[str]]]:
+        ids = self._load()["id"]
+        # id kolona nije sortirana; trazimo bajtove u mmap-u (C brzina) i provjeravamo poravnanje
+        needle = array.array(ids.format, [row_id]).tobytes()
+        mapped = ids.obj
+        pos = mapped.find(needle)
+        while pos != -1 and pos % ids.itemsize:
+            pos = mapped.find(needle, pos + 1)
+        return None if pos == -1 else self._row(self._columns, pos // ids.itemsize)
+
+    def _row(self, columns, i: int) -> Tuple[int, datetime, float, float, Optional[str]]:
+        code = columns["device"][i]
+        return (
+            columns["id"][i],
+            _from_micros(columns["recorded_at"][i]),
+            _from_float32(columns["temperature"][i]),
+            _from_float32(columns["humidity"][i]),
+            self.devices[code] if code >= 0 else None,
+        )
+
+
+_segments = {}
+
+
+def _list_segments() -> List[ArchiveSegment]:
+    if not os.path.isdir(SENSOR_ARCHIVE_DIR):
+        return []
+    found = []
+    for month in sorted(os.listdir(SENSOR_ARCHIVE_DIR)):
+        month_dir = os.path.join(SENSOR_ARCHIVE_DIR, month)
+        if not os.path.isdir(month_dir):
+            continue
+        for part in sorted(os.listdir(month_dir)):
+            if not part.startswith("part-"):
+                continue
+            path = os.path.join(month_dir, part)
+            if path not in _segments:
+                _segments[path] = ArchiveSegment(path)
+            found.append(_segments[path])
+    for path in set(_segments) - {segment.path for segment in found}:
+        del _segments[path]
+    return found
+
+
+def iter_archived(start: datetime = datetime.min, end: datetime = datetime.max,
+                  reverse: bool = False) -> Iterator[Tuple[int, datetime, float, float, Optional[str]]]:
+    """Archived readings in ``[start, end]`` ordered by time, read lazily from the segments."""
+    segments = [segment for segment in _list_segments() if segment.end >= start and segment.start <= end]
+    return heapq.merge(
+        *(segment.rows(start, end, reverse) for segment in segments),
+        key=lambda row: row[1],
+        reverse=reverse,
+    )
+
+
+def read_archived(start: datetime, end: datetime) -> List[Tuple[int, datetime, float, float, Optional[str]]]:
+    """Archived readings in ``[start, end]`` ordered by time."""
+    return list(iter_archived(start, end))
+
+
+def find_archived(row_id: int) -> Optional[Tuple[int, datetime, float, float, Optional[str]]]:
+    for segment in _list_segments():
+        row = segment.find(row_id)
+        if row is not None:
+            return row
+    return None
+
+
+async def latest_readings(db: AsyncSession, start: Optional[datetime], end: Optional[datetime],
+                          limit: int) -> List[Tuple[int, datetime, float, float, Optional[str]]]:
+    """The newest ``limit`` readings in ``[start, end]``, hot and archived, newest first.
+
+    Both sources are read only up to ``limit`` rows, so the cost does not grow
+    with the length of the history.
+    """
+    log = TemperatureHumidityLog
+    stmt = select(log.id, log.recorded_at, log.temperature, log.humidity, log.device_id)
+    if start is not None:
+        stmt = stmt.where(log.recorded_at >= start)
+    if end is not None:
+        stmt = stmt.where(log.recorded_at <= end)
+    hot = (await db.execute(stmt.order_by(log.recorded_at.desc(), log.id.desc()).limit(limit))).all()
+    cold = await run_in_threadpool(
+        lambda: list(islice(iter_archived(start or datetime.min, end or datetime.max, reverse=True), limit))
+    )
+    rows, seen = [], set()
+    for row in heapq.merge(hot, cold, key=lambda row: row[1], reverse=True):
+        # mjesec koji se upravo arhivira je u oba izvora
+        if row[0] in seen:
+            continue
+        seen.add(row[0])
+        rows.append(tuple(row))
+        if len(rows) == limit:
+            break
+    return rows
+
+
+async def _merge_archived(hot_batches: AsyncIterator[Sequence], reverse: bool = False,
+                         batch_size: int = ARCHIVE_BATCH_SIZE) -> AsyncIterator[List]:
+    """Merge time-ordered hot rows with the whole archive, ``batch_size`` rows at a time.
+
+    Hot rows must have the archive's shape ``(id, recorded_at, temperature,
+    humidity, device_id)`` and come in the same order (``reverse`` for newest
+    first). Archive segments are read in the threadpool, one batch ahead. A
+    row seen in both (a month being archived right now) is returned once.
+    """
+    archived = await run_in_threadpool(iter_archived, datetime.min, datetime.max, reverse)
+    hot_iter = hot_batches.__aiter__()
+    hot, cold = deque(), deque()
+    hot_done = cold_done = False
+
+    def first(a, b):
+        return a[1] >= b[1] if reverse else a[1] <= b[1]
+
+    # mjesec je u arhivi prije nego sto se obrisu vruci redovi (vidi archive_month),
+    # pa isti red moze doci iz oba izvora; isti id uvijek ima isto vrijeme
+    last_time, emitted = None, set()
+    out = []
+    while True:
+        if not hot and not hot_done:
+            try:
+                hot.extend(await hot_iter.__anext__())
+            except StopAsyncIteration:
+                hot_done = True
+            continue
+        if not cold and not cold_done:
+            chunk = await run_in_threadpool(lambda: list(islice(archived, batch_size)))
+            cold.extend(chunk)
+            cold_done = not chunk
+            continue
+        if not hot and not cold:
+            break
+        if hot and cold:
+            source = hot if first(hot[0], cold[0]) else cold
+        else:
+            source = hot or cold
+        row = source.popleft()
+        if row[1] != last_time:
+            last_time, emitted = row[1], set()
+        if row[0] in emitted:
+            continue
+        emitted.add(row[0])
+        out.append(row)
+        if len(out) >= batch_size:
+            yield out
+            out = []
+    if out:
+        yield out
+
+
+async def all_readings(reverse: bool = False, batch_size: int = ARCHIVE_BATCH_SIZE) -> AsyncIterator[List]:
+    """Every reading, hot and archived, as ``(id, recorded_at, temperature, humidity, device_id)`` batches in time order."""
+    log = TemperatureHumidityLog
+    order = (log.recorded_at.desc(), log.id.desc()) if reverse else (log.recorded_at, log.id)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(log.id, log.recorded_at, log.temperature, log.humidity, log.device_id)
+            .order_by(*order)
+            .execution_options(yield_per=batch_size)
+        )
+        async for batch in _merge_archived(result.partitions(batch_size), reverse, batch_size):
+            yield batch
+
+
+def _write_part(month: datetime, columns, devices, count: int, start: datetime, end: datetime) -> str:
+    month_dir = os.path.join(SENSOR_ARCHIVE_DIR, month.strftime("%Y-%m"))
+    os.makedirs(month_dir, exist_ok=True)
+    name = f"part-{time.time_ns()}"
+    tmp_dir = os.path.join(month_dir, f".{name}.tmp")
+    os.makedirs(tmp_dir)
+    for column, _ in COLUMNS:
+        with open(os.path.join(tmp_dir, f"{column}.bin"), "wb") as f:
+            columns[column].tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({
+            "count": count,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "devices": devices,
+        }, f)
+        f.flush()
+        os.fsync(f.fileno())
+    final_dir = os.path.join(month_dir, name)
+    os.rename(tmp_dir, final_dir)
+    return final_dir
+
+
+async def archive_month(db: AsyncSession, month: datetime) -> int:
+    """Move one month of hot readings into a new archive part.
+
+    Reading and deleting run in one REPEATABLE READ transaction, so rows that
+    arrive meanwhile are neither deleted nor lost; they go into a later part.
+    """
+    log = TemperatureHumidityLog
+    month_end = _next_month(month)
+    columns = {name: array.array(typecode) for name, typecode in COLUMNS}
+    devices, device_codes = [], {}
+    count, first, last = 0, None, None
+
+    result = await db.stream(
+        select(log.id, log.recorded_at, log.temperature, log.humidity, log.device_id)
+        .where(log.recorded_at >= month, log.recorded_at < month_end)
+        .order_by(log.recorded_at, log.id)
+        .execution_options(yield_per=ARCHIVE_BATCH_SIZE)
+    )
+    async for partition in result.partitions(ARCHIVE_BATCH_SIZE):
+        for row_id, recorded_at, temperature, humidity, device_id in partition:
+            if device_id is not None and device_id not in device_codes:
+                device_codes[device_id] = len(devices)
+                devices.append(device_id)
+            columns["id"].append(row_id)
+            columns["recorded_at"].append(_to_micros(recorded_at))
+            columns["temperature"].append(temperature)
+            columns["humidity"].append(humidity)
+            columns["device"].append(device_codes[device_id] if device_id is not None else -1)
+            first = first or recorded_at
+            last = recorded_at
+            count += 1
+
+    if not count:
+        await db.rollback()
+        return 0
+
+    part = await run_in_threadpool(_write_part, month, columns, devices, count, first, last)
+    try:
+        await db.execute(delete(log).where(log.recorded_at >= month, log.recorded_at < month_end))
+        # arhivirane vrijednosti su float32, pa se lista/export mogu neznatno promijeniti
+        await bump_version(db, log.__tablename__)
+        await db.commit()
+    except BaseException:
+        await run_in_threadpool(shutil.rmtree, part, True)
+        raise
+    return count
+
+
+def _drop_expired_archive(now: datetime):
+    if not SENSOR_ARCHIVE_RETENTION_MONTHS or not os.path.isdir(SENSOR_ARCHIVE_DIR):
+        return
+    oldest = _month_start(now)
+    for _ in range(SENSOR_ARCHIVE_RETENTION_MONTHS):
+        oldest = _month_start(oldest - timedelta(days=1))
+    for month in os.listdir(SENSOR_ARCHIVE_DIR):
+        try:
+            month_start = datetime.strptime(month, "%Y-%m")
+        except ValueError:
+            continue
+        if month_start < oldest:
+            shutil.rmtree(os.path.join(SENSOR_ARCHIVE_DIR, month), ignore_errors=True)
+
+
+async def run_retention(now: Optional[datetime] = None) -> int:
+    now = now or datetime.utcnow()
+    cutoff = _month_start(now - timedelta(days=SENSOR_HOT_RETENTION_DAYS))
+    archived = 0
+    # lock na nivou sesije mora se uzeti i pustiti na istoj konekciji; sesije iz poola
+    # bi poslije commita mogle dobiti drugu konekciju i lock bi ostao visiti
+    async with engine.connect() as lock_conn:
+        locked = await lock_conn.scalar(text("SELECT pg_try_advisory_lock(hashtext('sensor_archive'))"))
+        await lock_conn.commit()
+        if not locked:
+            return 0
+        try:
+            async with AsyncSessionLocal() as db:
+                month_col = func.date_trunc("month", TemperatureHumidityLog.recorded_at)
+                months = (await db.execute(
+                    select(month_col).where(TemperatureHumidityLog.recorded_at < cutoff).group_by(month_col)
+                )).scalars().all()
+            for month in sorted(months):
+                async with AsyncSessionLocal() as db:
+                    await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                    archived += await archive_month(db, month)
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext('sensor_archive'))"))
+            await lock_conn.commit()
+    await run_in_threadpool(_drop_expired_archive, now)
+    return archived
+
+
+async def run_retention_loop():
+    """Background loop started at application startup."""
+    while True:
+        try:
+            archived = await run_retention()
+            if archived:
+                logger.info("Sensor archive: moved %d readings out of the hot table", archived)
+        except Exception:
+            logger.exception("Sensor archiving failed")
+        await asyncio.sleep(SENSOR_ARCHIVE_INTERVAL)
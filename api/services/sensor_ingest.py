@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List
+
+from sqlalchemy import insert
+
+from database import AsyncSessionLocal, db_rejection
+from models.temperature_humidity import TemperatureHumidityLog
+from services.versioning import bump_version
+from services.sensor_rollups import apply_rollups
+
+logger = logging.getLogger(__name__)
+
+SENSOR_FLUSH_SIZE = int(os.getenv("SENSOR_FLUSH_SIZE", "2000"))
+SENSOR_FLUSH_INTERVAL = float(os.getenv("SENSOR_FLUSH_INTERVAL", "1.0"))
+# gornja granica ocitanja u memoriji; iznad toga ingest vraca 503
+SENSOR_MAX_PENDING = int(os.getenv("SENSOR_MAX_PENDING", "100000"))
+SENSOR_INSERT_CHUNK = 5000
+
+
+class BufferFull(Exception):
+    pass
+
+
+class ReadingBuffer:
+    """In-process write buffer for sensor readings.
+
+    Readings are flushed by a background task when ``flush_size`` rows are
+    pending or every ``flush_interval`` seconds, in one transaction per flush.
+    A batch the database rejects with the same error twice in a row is
+    dropped (and logged) instead of being retried forever; connection errors
+    are always retried.
+    """
+
+    def __init__(self, flush_size: int = SENSOR_FLUSH_SIZE, flush_interval: float = SENSOR_FLUSH_INTERVAL,
+                 max_pending: int = SENSOR_MAX_PENDING):
+        self._flush_size = flush_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._rows: List[Dict] = []
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._last_error = None
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, rows: List[Dict]):
+        if len(self._rows) + len(rows) > self._max_pending:
+            raise BufferFull()
+        self._rows.extend(rows)
+        if len(self._rows) >= self._flush_size:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                async with AsyncSessionLocal() as db:
+                    for i in range(0, len(rows), SENSOR_INSERT_CHUNK):
+                        await db.execute(insert(TemperatureHumidityLog), rows[i:i + SENSOR_INSERT_CHUNK])
+                    await apply_rollups(db, rows)
+                    await bump_version(db, TemperatureHumidityLog.__tablename__)
+                    await db.commit()
+            except BaseException as e:
+                error = db_rejection(e)
+                if error is not None and error == self._last_error:
+                    self._last_error = None
+                    self.dropped += len(rows)
+                    logger.error("Dropping %d sensor readings rejected twice by the database: %s", len(rows), error[1])
+                    return 0
+                self._last_error = error
+                # vracamo ocitanja na pocetak da se ne izgube, pokusace se u sljedecem flushu
+                self._rows[:0] = rows[: max(0, self._max_pending - len(self._rows))]
+                raise
+            self._last_error = None
+            return len(rows)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Sensor reading flush failed, %d readings pending", len(self._rows))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+reading_buffer = ReadingBuffer()
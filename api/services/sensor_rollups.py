@@ -0,0 +1,264 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from starlette.concurrency import run_in_threadpool
+
+from models.temperature_humidity import TemperatureHumidityLog, TemperatureHumidityRollup
+from schemas.temperature_humidity import RangePoint, Resolution
+from services.sensor_archive import read_archived
+
+BUCKET_SIZES = {
+    Resolution.minute: timedelta(minutes=1),
+    Resolution.hour: timedelta(hours=1),
+    Resolution.day: timedelta(days=1),
+}
+# do ovog prozora "auto" vraca sirova ocitanja
+RAW_MAX_WINDOW = timedelta(hours=1)
+DEFAULT_MAX_POINTS = 500
+# 9 parametara po bucketu, asyncpg dozvoljava najvise 32767 po upitu
+ROLLUP_UPSERT_CHUNK = 3000
+
+
+def bucket_start(ts: datetime, resolution: Resolution) -> datetime:
+    if resolution == Resolution.minute:
+        return ts.replace(second=0, microsecond=0)
+    if resolution == Resolution.hour:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _aggregate(rows: Iterable[Dict]) -> List[Dict]:
+    buckets: Dict[Tuple[str, datetime], Dict] = {}
+    for row in rows:
+        for resolution in BUCKET_SIZES:
+            key = (resolution.value, bucket_start(row["recorded_at"], resolution))
+            agg = buckets.get(key)
+            t, h = row["temperature"], row["humidity"]
+            if agg is None:
+                buckets[key] = {
+                    "resolution": key[0],
+                    "bucket_start": key[1],
+                    "count": 1,
+                    "temperature_min": t, "temperature_max": t, "temperature_sum": t,
+                    "humidity_min": h, "humidity_max": h, "humidity_sum": h,
+                }
+            else:
+                agg["count"] += 1
+                agg["temperature_min"] = min(agg["temperature_min"], t)
+                agg["temperature_max"] = max(agg["temperature_max"], t)
+                agg["temperature_sum"] += t
+                agg["humidity_min"] = min(agg["humidity_min"], h)
+                agg["humidity_max"] = max(agg["humidity_max"], h)
+                agg["humidity_sum"] += h
+    return list(buckets.values())
+
+
+async def apply_rollups(db: AsyncSession, rows: Sequence[Dict]):
+    """Fold newly inserted readings into the rollups, in the caller's transaction."""
+    # stalni redoslijed zakljucavanja bucketa izmedju paralelnih flusheva
+    aggregates = sorted(_aggregate(rows), key=lambda agg: (agg["resolution"], agg["bucket_start"]))
+    for i in range(0, len(aggregates), ROLLUP_UPSERT_CHUNK):
+        stmt = pg_insert(TemperatureHumidityRollup).values(aggregates[i:i + ROLLUP_UPSERT_CHUNK])
+        r, excluded = TemperatureHumidityRollup, stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[r.resolution, r.bucket_start],
+            set_={
+                "count": r.count + excluded.count,
+                "temperature_min": func.least(r.temperature_min, excluded.temperature_min),
+                "temperature_max": func.greatest(r.temperature_max, excluded.temperature_max),
+                "temperature_sum": r.temperature_sum + excluded.temperature_sum,
+                "humidity_min": func.least(r.humidity_min, excluded.humidity_min),
+                "humidity_max": func.greatest(r.humidity_max, excluded.humidity_max),
+                "humidity_sum": r.humidity_sum + excluded.humidity_sum,
+            },
+        )
+        await db.execute(stmt)
+
+
+_rebuild_sql = """
+    INSERT INTO temperature_humidity_rollup
+        (resolution, bucket_start, count, temperature_min, temperature_max, temperature_sum,
+         humidity_min, humidity_max, humidity_sum)
+    SELECT CAST(:resolution AS text), date_trunc(CAST(:resolution AS text), recorded_at), COUNT(*),
+           MIN(temperature), MAX(temperature), SUM(temperature),
+           MIN(humidity), MAX(humidity), SUM(humidity)
+    FROM temperature_humidity_log
+    WHERE recorded_at >= :start AND recorded_at < :end
+    GROUP BY 2
+"""
+
+
+async def rebuild_rollups(db: AsyncSession, start: datetime, end: datetime):
+    """Recompute every bucket in ``[start, end)`` from the raw log.
+
+    Used after updates and deletes, where min/max cannot be adjusted
+    incrementally. ``start``/``end`` must be aligned to day buckets.
+    """
+    await db.execute(
+        delete(TemperatureHumidityRollup).where(
+            TemperatureHumidityRollup.bucket_start >= start,
+            TemperatureHumidityRollup.bucket_start < end,
+        )
+    )
+    for resolution in BUCKET_SIZES:
+        await db.execute(text(_rebuild_sql), {"resolution": resolution.value, "start": start, "end": end})
+
+
+async def rebuild_rollups_around(db: AsyncSession, *timestamps: datetime):
+    for day in {bucket_start(ts, Resolution.day) for ts in timestamps}:
+        day_end = day + BUCKET_SIZES[Resolution.day]
+        await rebuild_rollups(db, day, day_end)
+        # dan moze biti djelimicno arhiviran (zakasnjela ocitanja za stari mjesec)
+        archived = await run_in_threadpool(read_archived, day, day_end - timedelta(microseconds=1))
+        if not archived:
+            continue
+        # redovi koji se upravo arhiviraju su jos u vrucoj tabeli i vec su uracunati
+        log = TemperatureHumidityLog
+        hot_ids = set((await db.execute(
+            select(log.id).where(log.recorded_at >= day, log.recorded_at < day_end)
+        )).scalars())
+        await apply_rollups(db, [
+            {"recorded_at": recorded_at, "temperature": temperature, "humidity": humidity}
+            for row_id, recorded_at, temperature, humidity, _ in archived
+            if row_id not in hot_ids
+        ])
+
+
+async def backfill_rollups(db: AsyncSession):
+    """Build the rollups once for history written before they existed."""
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('temperature_humidity_rollup_backfill'))"))
+    has_rollups = await db.scalar(select(TemperatureHumidityRollup.bucket_start).limit(1))
+    has_logs = await db.scalar(select(TemperatureHumidityLog.id).limit(1))
+    if has_rollups is None and has_logs is not None:
+        await rebuild_rollups(db, datetime.min, datetime.max)
+    await db.commit()
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: int) -> Resolution:
+    window = end - start
+    if window <= RAW_MAX_WINDOW:
+        return Resolution.raw
+    for resolution, size in BUCKET_SIZES.items():
+        if window / size <= max_points:
+            return resolution
+    return Resolution.day
+
+
+def lttb(xs: Sequence[float], series: Sequence[Sequence[float]], threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` visually significant points.
+
+    With several ``series`` each is scaled to its own range and a point's
+    triangle area is the sum over all of them, so one selection serves every
+    series.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    scaled = []
+    for ys in series:
+        lo, hi = min(ys), max(ys)
+        span = (hi - lo) or 1.0
+        scaled.append([(y - lo) / span for y in ys])
+
+    selected = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # prosjek sljedeceg bucketa je treci vrh trougla
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= n:
+            next_start, next_end = n - 1, n
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_ys = [sum(ys[next_start:next_end]) / span for ys in scaled]
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = 0.0
+            for ys, avg_y in zip(scaled, avg_ys):
+                area += abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def downsample(points: List[RangePoint], target: int) -> List[RangePoint]:
+    """At most ``target`` points, picked by LTTB over temperature and humidity together."""
+    if len(points) <= target:
+        return points
+    xs = [p.time.timestamp() for p in points]
+    keep = lttb(xs, [[p.temperature for p in points], [p.humidity for p in points]], target)
+    return [points[i] for i in keep]
+
+
+async def query_range(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    resolution: Resolution = Resolution.auto,
+    points: Optional[int] = None,
+) -> Tuple[Resolution, List[RangePoint]]:
+    if resolution == Resolution.auto:
+        resolution = choose_resolution(start, end, points or DEFAULT_MAX_POINTS)
+
+    if resolution == Resolution.raw:
+        log = TemperatureHumidityLog
+        result = await db.execute(
+            select(log.id, log.recorded_at, log.temperature, log.humidity)
+            .where(log.recorded_at >= start, log.recorded_at <= end)
+            .order_by(log.recorded_at)
+        )
+        hot = result.all()
+        hot_ids = {row.id for row in hot}
+        archived = await run_in_threadpool(read_archived, start, end)
+        rows = heapq.merge(
+            # mjesec koji se upravo arhivira moze biti vidljiv u oba izvora
+            ((recorded_at, temperature, humidity)
+             for row_id, recorded_at, temperature, humidity, _ in archived if row_id not in hot_ids),
+            ((row.recorded_at, row.temperature, row.humidity) for row in hot),
+            key=lambda row: row[0],
+        )
+        series = [
+            RangePoint(time=recorded_at, temperature=temperature, humidity=humidity)
+            for recorded_at, temperature, humidity in rows
+        ]
+    else:
+        r = TemperatureHumidityRollup
+        result = await db.execute(
+            select(r)
+            .where(
+                r.resolution == resolution.value,
+                r.bucket_start >= bucket_start(start, resolution),
+                r.bucket_start <= end,
+            )
+            .order_by(r.bucket_start)
+        )
+        series = [
+            RangePoint(
+                time=row.bucket_start,
+                temperature=row.temperature_sum / row.count,
+                humidity=row.humidity_sum / row.count,
+                count=row.count,
+                temperature_min=row.temperature_min,
+                temperature_max=row.temperature_max,
+                humidity_min=row.humidity_min,
+                humidity_max=row.humidity_max,
+            )
+            for row in result.scalars().all()
+        ]
+
+    if points:
+        series = downsample(series, points)
+    return resolution, series
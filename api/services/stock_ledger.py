@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal
+from models.medicine_models import StockLog, StockSnapshot
+
+logger = logging.getLogger(__name__)
+
+REASON_INITIAL = "initial"
+REASON_OPENING_BALANCE = "opening_balance"
+REASON_ADJUSTMENT = "adjustment"
+REASON_IMPORT = "import"
+REASON_SALE = "sale"
+
+STOCK_SNAPSHOT_INTERVAL = int(os.getenv("STOCK_SNAPSHOT_INTERVAL", "3600"))
+STOCK_SNAPSHOT_MIN_CHANGES = int(os.getenv("STOCK_SNAPSHOT_MIN_CHANGES", "20"))
+# zapisi mladji od ovoga se ne kompaktiraju, da transakcija koja jos nije
+# commitovana (manji id, kasniji commit) ne ostane izvan snapshota
+STOCK_SNAPSHOT_LAG_SECONDS = int(os.getenv("STOCK_SNAPSHOT_LAG_SECONDS", "60"))
+
+
+def record_stock_change(db: AsyncSession, medicine_id: int, change: int, reason: str):
+    """Add a ledger entry to the caller's transaction; no-op for a zero change."""
+    if change:
+        db.add(StockLog(medicine_id=medicine_id, change=change, reason=reason, created_at=datetime.utcnow()))
+
+
+async def record_stock_changes(db: AsyncSession, changes: Iterable[Tuple[int, int]], reason: str):
+    """Bulk variant of ``record_stock_change`` for ``(medicine_id, change)`` pairs."""
+    now = datetime.utcnow()
+    rows = [
+        {"medicine_id": medicine_id, "change": change, "reason": reason, "created_at": now}
+        for medicine_id, change in changes
+        if change
+    ]
+    if rows:
+        await db.execute(insert(StockLog), rows)
+
+
+async def backfill_opening_balances(db: AsyncSession):
+    """Give medicines created before the ledger existed an opening entry."""
+    await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('stock_ledger_backfill'))"))
+    result = await db.execute(text("""
+        INSERT INTO stock_log (medicine_id, change, reason, created_at)
+        SELECT m.id, m.quantity, :reason, now() AT TIME ZONE 'utc'
+        FROM medicine m
+        WHERE m.quantity <> 0
+          AND NOT EXISTS (SELECT 1 FROM stock_log l WHERE l.medicine_id = m.id)
+    """), {"reason": REASON_OPENING_BALANCE})
+    await db.commit()
+    return result.rowcount
+
+
+async def compact_snapshots(db: AsyncSession, min_changes: int = STOCK_SNAPSHOT_MIN_CHANGES) -> int:
+    """Write a new snapshot for every medicine with enough ledger entries since its last one."""
+    # samo jedan worker kompaktira u isto vrijeme
+    locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(hashtext('stock_snapshot_compaction'))"))
+    if not locked:
+        await db.rollback()
+        return 0
+    result = await db.execute(text("""
+        WITH latest AS (
+            SELECT DISTINCT ON (medicine_id) medicine_id, quantity, last_log_id
+            FROM stock_snapshot
+            ORDER BY medicine_id, last_log_id DESC
+        )
+        INSERT INTO stock_snapshot (medicine_id, quantity, last_log_id, as_of, created_at)
+        SELECT l.medicine_id,
+               COALESCE(latest.quantity, 0) + SUM(l.change),
+               MAX(l.id),
+               MAX(l.created_at),
+               now() AT TIME ZONE 'utc'
+        FROM stock_log l
+        LEFT JOIN latest ON latest.medicine_id = l.medicine_id
+        WHERE l.id > COALESCE(latest.last_log_id, 0)
+          AND l.created_at < (now() AT TIME ZONE 'utc') - make_interval(secs => :lag)
+        GROUP BY l.medicine_id, latest.quantity
+        HAVING COUNT(*) >= :min_changes
+    """), {"lag": STOCK_SNAPSHOT_LAG_SECONDS, "min_changes": min_changes})
+    await db.commit()
+    return result.rowcount
+
+
+async def run_snapshot_compaction():
+    """Background loop started at application startup."""
+    while True:
+        await asyncio.sleep(STOCK_SNAPSHOT_INTERVAL)
+        try:
+            async with AsyncSessionLocal() as db:
+                written = await compact_snapshots(db)
+            if written:
+                logger.info("Stock ledger: wrote %d snapshots", written)
+        except Exception:
+            logger.exception("Stock snapshot compaction failed")
+
+
+async def _latest_snapshot(db: AsyncSession, medicine_id: int, at: datetime) -> Optional[StockSnapshot]:
+    result = await db.execute(
+        select(StockSnapshot)
+        .where(StockSnapshot.medicine_id == medicine_id, StockSnapshot.as_of <= at)
+        .order_by(StockSnapshot.as_of.desc(), StockSnapshot.last_log_id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def stock_at(db: AsyncSession, medicine_id: int, at: datetime) -> int:
+    """Quantity on hand at ``at``: one snapshot plus the ledger entries after it."""
+    snapshot = await _latest_snapshot(db, medicine_id, at)
+    base, after_id = (snapshot.quantity, snapshot.last_log_id) if snapshot else (0, 0)
+    delta = await db.scalar(
+        select(func.coalesce(func.sum(StockLog.change), 0)).where(
+            StockLog.medicine_id == medicine_id,
+            StockLog.id > after_id,
+            StockLog.created_at <= at,
+        )
+    )
+    return base + int(delta)
+
+
+async def stock_movement(db: AsyncSession, medicine_id: int, start: datetime, end: datetime) -> Dict[str, int]:
+    """Net change per reason between ``start`` (exclusive) and ``end`` (inclusive)."""
+    result = await db.execute(
+        select(StockLog.reason, func.sum(StockLog.change))
+        .where(
+            StockLog.medicine_id == medicine_id,
+            StockLog.created_at > start,
+            StockLog.created_at <= end,
+        )
+        .group_by(StockLog.reason)
+    )
+    return {reason or "unknown": int(total) for reason, total in result.all()}
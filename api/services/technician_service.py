@@ -4,6 +4,7 @@ from schemas.user import UserCreate
 from services.auth import get_password_hash
 from repositories import user_repository
 from models.user_models import EmployeeStatusEnum, RoleEnum
+from services.principal_cache import principal_cache
 
 
 
@@ -20,12 +21,13 @@ async def create_technician(user: UserCreate, db: AsyncSession):
     if existing_email:
         raise HTTPException(status_code=400, detail="Email already registered")
 
+    hashed_password = await get_password_hash(user.password)
     user_data = {
         "first_name": user.first_name,
         "last_name": user.last_name,
         "username": user.username,
         "email": user.email,
-        "hashed_password": get_password_hash(user.password),
+        "hashed_password": hashed_password,
         "role": RoleEnum.technician,
         "status": user.status or EmployeeStatusEnum.active,
     }
@@ -37,4 +39,5 @@ async def update_technician_status(tech_id: int, status: EmployeeStatusEnum, db:
     technician = await user_repository.update_user_status(db, tech_id, status)
     if not technician:
         raise HTTPException(status_code=404, detail="Technician not found")
+    principal_cache.invalidate(technician.username)
     return technician
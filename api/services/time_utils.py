@@ -0,0 +1,8 @@
+from datetime import datetime, timezone
+
+
+def to_naive_utc(dt: datetime) -> datetime:
+    # kolone se pune sa datetime.utcnow(), pa se poredjenja rade u UTC
+    if dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
@@ -0,0 +1,61 @@
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from database import get_db
+from models.table_version import TableVersion
+
+
+async def bump_version(db: AsyncSession, *table_names: str):
+    """Increment the version of ``table_names`` in the caller's transaction.
+
+    Call before ``commit`` so the new version becomes visible together with
+    the data it describes.
+    """
+    stmt = pg_insert(TableVersion).values([{"table_name": name, "version": 1} for name in table_names])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TableVersion.table_name],
+        set_={"version": TableVersion.version + 1},
+    )
+    await db.execute(stmt)
+
+
+async def table_version(db: AsyncSession, table_name: str) -> int:
+    result = await db.execute(select(TableVersion.version).where(TableVersion.table_name == table_name))
+    return result.scalar() or 0
+
+
+async def current_etag(db: AsyncSession, *table_names: str) -> str:
+    result = await db.execute(
+        select(TableVersion.table_name, TableVersion.version).where(TableVersion.table_name.in_(table_names))
+    )
+    versions = dict(result.all())
+    tag = ".".join(f"{name}-{versions.get(name, 0)}" for name in table_names)
+    return f'W/"{tag}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # slaba usporedba: W/ prefiks se ignorise
+    return etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in tags]
+
+
+def conditional_get(*table_names: str):
+    """Dependency that answers 304 when the client already has the current version.
+
+    Only the ``table_version`` row(s) are read; the listed tables are not
+    touched when the client's copy is still current.
+    """
+
+    async def dependency(request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+        etag = await current_etag(db, *table_names)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+
+    return dependency
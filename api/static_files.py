@@ -0,0 +1,38 @@
+import os
+import re
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+# <sha256>.<ext> ili <sha256>_<varijanta>.webp (vidi services/image_service.py)
+_content_addressed = re.compile(r"^([0-9a-f]{64})(?:_([a-z]+))?\.[a-z0-9]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for content-addressed uploads.
+
+    Files named after their sha256 never change, so they get a strong,
+    content-derived ETag and a one-year immutable Cache-Control. Anything else
+    (legacy ``medicine_<id>`` images) must be revalidated, which costs a 304
+    instead of the image bytes while it is unchanged.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        match = _content_addressed.match(os.path.basename(full_path))
+        if match:
+            digest, variant = match.groups()
+            response.headers["etag"] = f'"{digest}-{variant}"' if variant else f'"{digest}"'
+            response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["cache-control"] = REVALIDATE_CACHE_CONTROL
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,11 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# testovi rade nad pravom Postgres bazom, npr.
+# DATABASE_URL=postgresql+asyncpg://postgres@localhost/pharma_test
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
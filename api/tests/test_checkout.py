@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal, Base, engine
+from models.lookup import MedicineType
+from models.medicine_models import Medicine, StockLog
+from models.shopping_cart import ShoppingCart
+from models.table_version import TableVersion  # noqa: F401 (registruje tabelu)
+from models.user_models import RoleEnum, User
+from routers.shopping_cart import checkout
+
+CUSTOMERS = 8
+
+
+@pytest_asyncio.fixture
+async def last_unit_in_every_cart():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        medicine_type = MedicineType(name="Tablet")
+        db.add(medicine_type)
+        await db.flush()
+        medicine = Medicine(name="Paracetamol", quantity=1, type_id=medicine_type.id)
+        users = [
+            User(first_name="C", last_name=str(i), username=f"customer{i}", email=f"customer{i}@example.com",
+                 hashed_password="x", role=RoleEnum.customer)
+            for i in range(CUSTOMERS)
+        ]
+        db.add_all([medicine, *users])
+        await db.flush()
+        db.add_all([ShoppingCart(user_id=user.id, medicine_id=medicine.id, quantity=1) for user in users])
+        await db.commit()
+        yield medicine.id, [user.id for user in users]
+
+    await engine.dispose()
+
+
+async def _checkout(user_id: int):
+    async with AsyncSessionLocal() as db:
+        try:
+            return await checkout(db=db, current_user=SimpleNamespace(id=user_id))
+        except HTTPException as e:
+            return e
+
+
+@pytest.mark.asyncio
+async def test_parallel_checkouts_sell_the_last_unit_once(last_unit_in_every_cart):
+    medicine_id, user_ids = last_unit_in_every_cart
+
+    results = await asyncio.gather(*(_checkout(user_id) for user_id in user_ids))
+
+    succeeded = [r for r in results if not isinstance(r, HTTPException)]
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(succeeded) == 1
+    assert all(r.status_code == 400 and "Not enough stock" in r.detail for r in rejected)
+
+    async with AsyncSessionLocal() as db:
+        assert (await db.get(Medicine, medicine_id)).quantity == 0
+        sales = (await db.execute(select(StockLog.change).where(StockLog.medicine_id == medicine_id))).scalars().all()
+        assert sales == [-1]
+        carts = (await db.execute(select(ShoppingCart.user_id))).scalars().all()
+        assert len(carts) == CUSTOMERS - 1
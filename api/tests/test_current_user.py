@@ -0,0 +1,44 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.future import select
+
+from database import AsyncSessionLocal, Base, engine
+from dependencies import get_current_user
+from models.table_version import TableVersion  # noqa: F401 (registruje tabelu)
+from models.user_models import RoleEnum, User
+from services.auth import create_access_token
+from services.principal_cache import principal_cache
+
+
+@pytest_asyncio.fixture
+async def cached_user():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        user = User(first_name="Ana", last_name="A", username="ana", email="ana@example.com",
+                    hashed_password="x", role=RoleEnum.customer)
+        db.add(user)
+        await db.commit()
+        principal_cache.put(user)
+        yield user.id
+
+    principal_cache.invalidate("ana")
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cached_user_can_be_modified_and_committed(cached_user):
+    token = create_access_token({"sub": "ana"})
+
+    async with AsyncSessionLocal() as db:
+        current_user = await get_current_user(access_token=token, db=db)
+        assert current_user in db
+        await db.refresh(current_user)
+        current_user.first_name = "Anna"
+        await db.commit()
+
+    async with AsyncSessionLocal() as db:
+        stored = (await db.execute(select(User.first_name).where(User.id == cached_user))).scalar_one()
+        assert stored == "Anna"
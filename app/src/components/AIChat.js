@@ -43,16 +43,28 @@ export default function AIChat() {
     scrollToBottom();
   }, [messages, loading]);
 
+  const abortRef = useRef(null);
+
+  useEffect(() => () => abortRef.current?.abort(), []);
+
+  const updateMessage = (id, update) => {
+    setMessages((prev) => prev.map((m) => (m.id === id ? { ...m, ...update(m) } : m)));
+  };
+
   const sendMessage = async () => {
     if (!input.trim() || loading) return;
 
     const userMessage = { role: "user", content: input, id: uuidv4() };
+    const assistantId = uuidv4();
     setMessages((prev) => [...prev, userMessage]);
     setInput("");
     setLoading(true);
 
+    const controller = new AbortController();
+    abortRef.current = controller;
+
     try {
-      const res = await fetch("http://localhost:8000/chat/", {
+      const res = await fetch("http://localhost:8000/chat/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -60,22 +72,51 @@ export default function AIChat() {
           role: "user",
           conversation_id: conversationId,
         }),
+        credentials: "include",
+        signal: controller.signal,
       });
 
-      const data = await res.json();
-
-      if (res.ok) {
-        setMessages((prev) => [
-          ...prev,
-          { role: "assistant", content: data.response, id: uuidv4() },
-        ]);
-      } else {
+      if (!res.ok) {
+        const data = await res.json();
         setMessages((prev) => [
           ...prev,
           { role: "assistant", content: data.detail || "Error from AI", id: uuidv4() },
         ]);
+        return;
+      }
+
+      // odgovor stize kao SSE: "event: token|done|error" + "data: {...}"
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let started = false;
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || "{}");
+          if (event === "token") {
+            if (!started) {
+              started = true;
+              setLoading(false);
+              setMessages((prev) => [...prev, { role: "assistant", content: data.content, id: assistantId }]);
+            } else {
+              updateMessage(assistantId, (m) => ({ content: m.content + data.content }));
+            }
+          } else if (event === "error") {
+            setMessages((prev) => [
+              ...prev.filter((m) => m.id !== assistantId),
+              { role: "assistant", content: data.detail || "Error from AI", id: uuidv4() },
+            ]);
+          }
+        }
       }
     } catch (error) {
+      if (error.name === "AbortError") return;
       setMessages((prev) => [
         ...prev,
         { role: "assistant", content: "Error connecting to server.", id: uuidv4() },
@@ -97,6 +138,7 @@ export default function AIChat() {
   };
 
   const clearChat = () => {
+    abortRef.current?.abort();
     setMessages([]);
   };
 
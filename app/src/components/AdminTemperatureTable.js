@@ -5,7 +5,7 @@ import {
     Table, TableBody, TableCell, TableContainer, TableHead, TableRow,
     Alert, alpha
 } from "@mui/material"
-import { Assignment, Refresh } from "@mui/icons-material"
+import { Assignment, Refresh, NotificationsActive } from "@mui/icons-material"
 import api from "@/lib/api"
 
 const colors = {
@@ -23,6 +23,7 @@ export default function AdminTemperatureTable() {
     const [logs, setLogs] = useState([])
     const [loading, setLoading] = useState(false)
     const [error, setError] = useState(null)
+    const [alerts, setAlerts] = useState([])
 
     const fetchLogs = async () => {
         setLoading(true)
@@ -42,6 +43,18 @@ export default function AdminTemperatureTable() {
         fetchLogs()
     }, [])
 
+    // alarmi stizu preko SSE-a cim ocitanje udje, bez ponovnog ucitavanja tabele
+    useEffect(() => {
+        const source = new EventSource(`${api.defaults.baseURL}/temperature-humidity/alerts/stream`, { withCredentials: true })
+        source.addEventListener("alert", (e) => {
+            const alert = JSON.parse(e.data)
+            setAlerts(prev => [{ ...alert, key: `${alert.rule_id}-${alert.recorded_at}-${alert.kind}` }, ...prev].slice(0, 20))
+        })
+        return () => source.close()
+    }, [])
+
+    const dismissAlert = (key) => setAlerts(prev => prev.filter(a => a.key !== key))
+
     return (
         <Box sx={{
             minHeight: "100vh",
@@ -69,6 +82,18 @@ export default function AdminTemperatureTable() {
                     </Button>
                 </Box>
 
+                {alerts.map(alert => (
+                    <Alert
+                        key={alert.key}
+                        severity="warning"
+                        icon={<NotificationsActive />}
+                        onClose={() => dismissAlert(alert.key)}
+                        sx={{ mb: 2, borderRadius: 2 }}
+                    >
+                        {alert.message} ({new Date(alert.recorded_at).toLocaleString()})
+                    </Alert>
+                ))}
+
                 {loading && (
                     <Box sx={{ textAlign: 'center', py: 4 }}>
                         <CircularProgress sx={{ color: colors.primary }} />
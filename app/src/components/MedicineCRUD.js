@@ -8,6 +8,7 @@ import {
 import { Add, Edit, Delete, Refresh, Close } from "@mui/icons-material"
 
 const API_BASE = "http://localhost:8000"
+const PAGE_SIZE = 100
 
 const colors = {
   primary: "#275DAD",
@@ -22,6 +23,7 @@ const colors = {
 
 export default function MedicineCRUD() {
   const [medicines, setMedicines] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
   const [medicineTypes, setMedicineTypes] = useState([])
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
@@ -39,14 +41,18 @@ export default function MedicineCRUD() {
     image: null
   })
 
-  const fetchMedicines = async () => {
+  const fetchMedicines = async (cursor = null) => {
     setLoading(true)
     setError(null)
     try {
-      const res = await fetch(`${API_BASE}/medicine/`, { credentials: "include" })
+      const params = new URLSearchParams({ limit: String(PAGE_SIZE) })
+      if (cursor) params.set("cursor", cursor)
+      const res = await fetch(`${API_BASE}/medicine/?${params}`, { credentials: "include" })
       if (!res.ok) throw new Error("Failed to fetch medicines")
       const data = await res.json()
-      setMedicines(data)
+      // bez kursora krecemo ispocetka (refresh, nakon save/delete)
+      setMedicines(prev => cursor ? prev.concat(data.items) : data.items)
+      setNextCursor(data.next_cursor)
     } catch (err) {
       setError(err.message)
     } finally {
@@ -188,12 +194,12 @@ export default function MedicineCRUD() {
       <Container maxWidth="xl">
         <Box sx={{ display: 'flex', alignItems: 'center', mb: 3 }}>
           <Typography variant="h5" sx={{ fontWeight: 600, color: colors.primary }}>
-            Medicines ({medicines.length})
+            Medicines ({medicines.length}{nextCursor ? "+" : ""})
           </Typography>
           <Button onClick={() => handleOpenDialog()} startIcon={<Add />} sx={{ ml: 'auto', backgroundColor: colors.secondary, '&:hover': { backgroundColor: colors.primary, color: "#fff" } }}>
             Add Medicine
           </Button>
-          <Button onClick={fetchMedicines} startIcon={<Refresh />} sx={{ ml: 2, color: colors.primary }}>
+          <Button onClick={() => fetchMedicines()} startIcon={<Refresh />} sx={{ ml: 2, color: colors.primary }}>
             Refresh
           </Button>
         </Box>
@@ -246,6 +252,14 @@ export default function MedicineCRUD() {
           </Table>
         </TableContainer>
 
+        {nextCursor && (
+          <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+            <Button onClick={() => fetchMedicines(nextCursor)} disabled={loading} sx={{ color: colors.primary }}>
+              Load more
+            </Button>
+          </Box>
+        )}
+
         <Dialog open={openDialog} onClose={handleCloseDialog}>
           <DialogTitle>{editMed ? "Edit Medicine" : "Add Medicine"}</DialogTitle>
           <DialogContent sx={{ display: 'flex', flexDirection: 'column', gap: 2, mt: 1 }}>
@@ -1,6 +1,6 @@
 "use client";
 
-import { useEffect, useState, useMemo } from "react";
+import { useEffect, useState, useMemo, useRef } from "react";
 import {
     Box,
     Container,
@@ -24,6 +24,7 @@ import {
     Button,
 } from "@mui/material";
 import { ShoppingCart, Search } from "@mui/icons-material";
+import { imageUrl } from "@/lib/images";
 
 const API_BASE = "http://localhost:8000";
 
@@ -35,9 +36,21 @@ const colors = {
 };
 
 const ITEMS_PER_PAGE = 8;
+// stranica sa servera; sljedece se ucitavaju tek na zahtjev
+const FETCH_PAGE_SIZE = 96;
+const SEARCH_LIMIT = 50;
+const SEARCH_DEBOUNCE_MS = 300;
+
+const SORT_PARAMS = {
+    "name-asc": { sort: "name", order: "asc" },
+    "name-desc": { sort: "name", order: "desc" },
+    "price-asc": { sort: "price", order: "asc" },
+    "price-desc": { sort: "price", order: "desc" },
+};
 
 export default function MedicineGallery() {
     const [medicines, setMedicines] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(false);
     const [error, setError] = useState(null);
     const [search, setSearch] = useState("");
@@ -46,49 +59,89 @@ export default function MedicineGallery() {
     const [sort, setSort] = useState("");
     const [quantityDialog, setQuantityDialog] = useState(null);
     const [quantity, setQuantity] = useState(1);
+    // odgovor na zastarjeli zahtjev (stari sort ili pojam) se ignorise
+    const latestRequest = useRef(0);
 
-    // Fetch medicines
-    const fetchMedicines = async () => {
+    // Fetch medicines (sortiranje radi server, kursor se resetuje kad se promijeni sort)
+    const fetchMedicines = async (cursor = null) => {
+        const request = ++latestRequest.current;
         setLoading(true);
         setError(null);
         try {
-            const res = await fetch(`${API_BASE}/medicine/`, { credentials: "include" });
+            const params = new URLSearchParams({
+                limit: String(FETCH_PAGE_SIZE),
+                fields: "id,name,strength,dosage_form,quantity,price,image_path,expiration_date",
+            });
+            if (SORT_PARAMS[sort]) {
+                params.set("sort", SORT_PARAMS[sort].sort);
+                params.set("order", SORT_PARAMS[sort].order);
+            }
+            if (cursor) params.set("cursor", cursor);
+            const res = await fetch(`${API_BASE}/medicine/?${params}`, { credentials: "include" });
             if (!res.ok) throw new Error("Failed to fetch medicines");
             const data = await res.json();
+            if (request !== latestRequest.current) return;
+            setMedicines((prev) => (cursor ? prev.concat(data.items) : data.items));
+            setNextCursor(data.next_cursor);
+        } catch (err) {
+            if (request === latestRequest.current) setError(err.message);
+        } finally {
+            if (request === latestRequest.current) setLoading(false);
+        }
+    };
+
+    // Pretraga ide na server, preko cijelog kataloga a ne samo ucitanih stranica
+    const searchMedicines = async (term) => {
+        const request = ++latestRequest.current;
+        setLoading(true);
+        setError(null);
+        try {
+            const params = new URLSearchParams({ q: term, limit: String(SEARCH_LIMIT) });
+            const res = await fetch(`${API_BASE}/medicine/search?${params}`, { credentials: "include" });
+            if (!res.ok) throw new Error("Failed to search medicines");
+            const data = await res.json();
+            if (request !== latestRequest.current) return;
             setMedicines(data);
+            setNextCursor(null);
         } catch (err) {
-            setError(err.message);
+            if (request === latestRequest.current) setError(err.message);
         } finally {
-            setLoading(false);
+            if (request === latestRequest.current) setLoading(false);
         }
     };
 
     useEffect(() => {
-        fetchMedicines();
-    }, []);
+        const term = search.trim();
+        setPage(1);
+        if (!term) {
+            fetchMedicines();
+            return;
+        }
+        const timer = setTimeout(() => searchMedicines(term), SEARCH_DEBOUNCE_MS);
+        return () => clearTimeout(timer);
+    }, [search, sort]);
 
+    // rezultati pretrage su kompletni (najvise SEARCH_LIMIT), pa se mogu sortirati ovdje
     const filteredMedicines = useMemo(() => {
-        let filtered = medicines.filter((med) =>
-            med.name.toLowerCase().includes(search.toLowerCase())
-        );
-
+        if (!search.trim()) return medicines;
+        const sorted = [...medicines];
         switch (sort) {
             case "name-asc":
-                filtered.sort((a, b) => a.name.localeCompare(b.name));
+                sorted.sort((a, b) => a.name.localeCompare(b.name));
                 break;
             case "name-desc":
-                filtered.sort((a, b) => b.name.localeCompare(a.name));
+                sorted.sort((a, b) => b.name.localeCompare(a.name));
                 break;
             case "price-asc":
-                filtered.sort((a, b) => a.price - b.price);
+                sorted.sort((a, b) => a.price - b.price);
                 break;
             case "price-desc":
-                filtered.sort((a, b) => b.price - a.price);
+                sorted.sort((a, b) => b.price - a.price);
                 break;
             default:
                 break;
         }
-        return filtered;
+        return sorted;
     }, [medicines, search, sort]);
 
     const pageCount = Math.ceil(filteredMedicines.length / ITEMS_PER_PAGE);
@@ -145,7 +198,7 @@ export default function MedicineGallery() {
                     <TextField
                         placeholder="Search medicine..."
                         value={search}
-                        onChange={(e) => { setSearch(e.target.value); setPage(1); }}
+                        onChange={(e) => setSearch(e.target.value)}
                         sx={{
                             maxWidth: 300,
                             width: "100%",
@@ -233,7 +286,7 @@ export default function MedicineGallery() {
                                 <CardMedia
                                     component="img"
                                     height="150"
-                                    image={med.image_path ? `${API_BASE}/${med.image_path}` : "/placeholder-medicine.png"}
+                                    image={imageUrl(API_BASE, med.image_path, "thumb") || "/placeholder-medicine.png"}
                                     alt={med.name}
                                     sx={{ objectFit: "cover" }}
                                 />
@@ -291,6 +344,14 @@ export default function MedicineGallery() {
                     </Box>
                 )}
 
+                {nextCursor && !search.trim() && (
+                    <Box sx={{ mt: 2, display: "flex", justifyContent: "center" }}>
+                        <Button onClick={() => fetchMedicines(nextCursor)} disabled={loading} sx={{ color: colors.primary }}>
+                            Load more medicines
+                        </Button>
+                    </Box>
+                )}
+
                 {/* Medicine Dialog */}
                 <Dialog
                     open={!!selectedMed}
@@ -315,7 +376,7 @@ export default function MedicineGallery() {
                                     <CardMedia
                                         component="img"
                                         height="300"
-                                        image={selectedMed.image_path ? `${API_BASE}/${selectedMed.image_path}` : "/placeholder-medicine.png"}
+                                        image={imageUrl(API_BASE, selectedMed.image_path, "web") || "/placeholder-medicine.png"}
                                         alt={selectedMed.name}
                                         sx={{ objectFit: "cover", borderRadius: 2 }}
                                     />
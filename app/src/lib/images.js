@@ -0,0 +1,10 @@
+// Slike spremljene po sadrzaju (sha256) imaju i manje varijante:
+// uploaded_images/<hash>_thumb.webp i uploaded_images/<hash>_web.webp
+const CONTENT_ADDRESSED = /^(uploaded_images\/[0-9a-f]{64})\.[a-z]+$/
+
+export function imageUrl(apiBase, imagePath, variant) {
+  if (!imagePath) return null
+  const path = imagePath.replaceAll("\\", "/")
+  const match = variant ? path.match(CONTENT_ADDRESSED) : null
+  return match ? `${apiBase}/${match[1]}_${variant}.webp` : `${apiBase}/${path}`
+}